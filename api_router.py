@@ -1,15 +1,24 @@
 """Enhanced API Router with Queue System and Concurrency Management"""
 import os
+import hashlib
+import hmac
 import logging
-import uuid
-from datetime import datetime
-from flask import Blueprint, request, jsonify, g
+import math
+import secrets
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, abort, current_app, request, jsonify, g
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from functools import wraps
+import fastjsonschema
+from cachetools import TTLCache
+from werkzeug.local import LocalProxy
+from werkzeug.utils import secure_filename
 
 from job_queue import JobQueue, JobStatus
-from auth_service import AuthService
+from auth_service import AuthService, API_KEY_PREFIX, API_KEY_MAX_LENGTH
 from storage_service import StorageService
 from concurrency_manager import ConcurrencyManager
 
@@ -17,172 +26,318 @@ logger = logging.getLogger("vividflow")
 
 api_bp = Blueprint("api_v1", __name__, url_prefix="/api/v1")
 
+# Resolved lazily so importing the blueprint doesn't open the job database
+queue = LocalProxy(lambda: JobQueue.get_instance())
+
+ALLOWED_IMAGE_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'webp'})
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+# Whole-body cap checked before the multipart form is parsed; leaves room
+# for the non-file fields alongside a maximum-size image.
+MAX_REQUEST_BYTES = MAX_UPLOAD_BYTES + 64 * 1024
+TRUE_STRINGS = frozenset({'true', '1', 'yes'})
+IMAGE_URL_PREFIXES = ("gs://", "http://", "https://")
+# Schemes are case-insensitive; only the longest prefix needs lowercasing
+IMAGE_URL_PREFIX_LEN = max(map(len, IMAGE_URL_PREFIXES))
+MIN_PROMPT_LENGTH = 3
+PROMPT_LOG_PREVIEW = 100
+UPLOAD_COPY_BUFFER = 1024 * 1024
+
+# Uploaded images wait here until the worker picks up their job
+TEMP_UPLOAD_DIR = os.path.abspath(os.getenv("TEMP_UPLOAD_DIR", "temp_uploads"))
+os.makedirs(TEMP_UPLOAD_DIR, exist_ok=True)
+
+# Finished jobs never change again, so pollers may reuse their /status body
+# briefly. Kept well under the 60 minute lifetime of signed result URLs.
+TERMINAL_JOB_STATUSES = frozenset({JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED})
+TERMINAL_STATUS_MAX_AGE = 300
+
+# /usage and /history are polled by dashboards; serve repeat hits from short
+# per-user caches. Both are dropped when the user submits or cancels a job;
+# worker-side status changes show up within the TTL (/status is never cached).
+USAGE_CACHE_TTL = 10
+HISTORY_CACHE_TTL = 5
+HISTORY_CACHE_MAX_LIMIT = 100
+_usage_cache = TTLCache(maxsize=10_000, ttl=USAGE_CACHE_TTL)
+_history_cache = TTLCache(maxsize=10_000, ttl=HISTORY_CACHE_TTL)  # user_id -> {limit: jobs}
+_user_cache_lock = threading.Lock()
+
+def _invalidate_user_views(user_id):
+    with _user_cache_lock:
+        _usage_cache.pop(user_id, None)
+        _history_cache.pop(user_id, None)
+
+# High limits for overall API usage, concurrency handles actual load.
+# /generate is additionally limited per authenticated user. /status gets its
+# own per-user bucket instead of the shared default: clients poll it every
+# second or so while a job runs, which would exhaust the default within an hour.
+if os.getenv("FLASK_ENV") == "production":
+    API_DEFAULT_LIMITS = ["2000 per hour"]
+    GENERATE_USER_LIMIT = "100 per hour"
+    STATUS_USER_LIMIT = "10000 per hour"
+else:
+    API_DEFAULT_LIMITS = ["1000000 per hour"]
+    GENERATE_USER_LIMIT = "1000000 per hour"
+    STATUS_USER_LIMIT = "1000000 per hour"
+
+# Read once at import (after web_app has loaded .env); empty disables admin routes
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "").encode()
+
+# Shared counter storage so limits hold across Gunicorn workers. Falls back
+# to per-process memory when REDIS_URL is unset or Redis is unreachable.
+RATELIMIT_STORAGE_URI = os.getenv("REDIS_URL", "memory://")
+
+# Built once at import; web_app attaches it with init_app()
+api_limiter = Limiter(
+    get_remote_address,
+    default_limits=API_DEFAULT_LIMITS,
+    storage_uri=RATELIMIT_STORAGE_URI,
+    strategy="fixed-window",
+    in_memory_fallback_enabled=True,
+)
+
 def get_api_rate_limiter():
-    # High limits for overall API usage, concurrency handles actual load
-    if os.getenv("FLASK_ENV") == "production":
-        return Limiter(get_remote_address, default_limits=["2000 per hour"], storage_uri="memory://")
-    else:
-        return Limiter(get_remote_address, default_limits=["1000000 per hour"], storage_uri="memory://")
+    return api_limiter
+
+def _user_rate_key():
+    # Only valid on api_key_required views; _auth_gate sets g.user_id
+    return g.user_id
+
+# Never written to the logs, even at DEBUG
+SENSITIVE_HEADERS = frozenset({'x-api-key', 'x-admin-key', 'authorization', 'cookie'})
+
+def _redacted_headers(headers):
+    return {k: '***' if k.lower() in SENSITIVE_HEADERS else v for k, v in headers.items()}
 
 # --- Auth & Approval ---
 
+# Views declare what they need with these markers; _auth_gate enforces it
+# once per request before the view (and its per-user rate limit) runs.
 def api_key_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        request_id = str(uuid.uuid4())[:8]
-        logger.info(f"[{request_id}] API request: {request.method} {request.path} | Headers: {dict(request.headers)}")
-        
-        # Check for API key in header or query parameter (for browser access)
-        api_key = request.headers.get('X-API-Key') or request.args.get('api_key')
-        if not api_key:
-            logger.warning(f"[{request_id}] Missing API key from {request.remote_addr}")
-            return jsonify({"error": "API key is missing", "request_id": request_id}), 401
-        
-        user = AuthService.get_user_by_api_key(api_key)
-        if not user:
-            logger.warning(f"[{request_id}] Invalid API key used from {request.remote_addr}")
-            return jsonify({"error": "Invalid API key", "request_id": request_id}), 401
-        
-        # Check Approval
-        if not user.get('is_approved', False):
-            logger.warning(f"[{request_id}] Unapproved user {user['id']} attempted API access")
-            return jsonify({"error": "Account pending approval", "request_id": request_id}), 403
-        
-        g.user_id = user['id']
-        g.user_email = user.get('email', 'unknown')
-        g.request_id = request_id
-        logger.info(f"[{request_id}] Authenticated user: {g.user_email} ({g.user_id})")
-        return f(*args, **kwargs)
-    return decorated_function
+    f.required_auth = "api_key"
+    return f
 
 def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        request_id = getattr(g, 'request_id', str(uuid.uuid4())[:8])
-        logger.info(f"[{request_id}] Admin request: {request.method} {request.path}")
-        
-        admin_key = request.headers.get('X-Admin-Key')
-        if admin_key and admin_key == os.getenv("ADMIN_API_KEY"):
-            logger.info(f"[{request_id}] Admin access granted")
-            return f(*args, **kwargs)
-        logger.warning(f"[{request_id}] Failed admin access attempt from {request.remote_addr}")
-        return jsonify({"error": "Admin access required", "request_id": request_id}), 403
-    return decorated_function
+    f.required_auth = "admin"
+    return f
+
+@api_bp.before_request
+def _body_size_gate():
+    # The cap covers the API only; web UI uploads are not limited here.
+    # Declared oversize bodies are refused without reading them (app 413 handler)
+    if (request.content_length or 0) > MAX_REQUEST_BYTES:
+        abort(413)
+    # Chunked bodies declare no length; Werkzeug stops reading past this
+    request.max_content_length = MAX_REQUEST_BYTES
+
+@api_bp.before_request
+def _auth_gate():
+    g.request_id = secrets.token_hex(4)
+    # CORS preflights carry no credentials, and unmatched routes should 404/405
+    if request.method == 'OPTIONS' or request.routing_exception is not None:
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    required = getattr(view, 'required_auth', None)
+    if required is None:
+        return None
+    if required == "api_key":
+        return _check_api_key(g.request_id)
+    if required == "admin":
+        return _check_admin_key(g.request_id)
+
+def _check_api_key(request_id):
+    logger.info("[%s] API request: %s %s", request_id, request.method, request.path)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[%s] Headers: %s", request_id, _redacted_headers(request.headers))
+    
+    # Check for API key in header or query parameter (for browser access)
+    api_key = request.headers.get('X-API-Key') or request.args.get('api_key')
+    if not api_key:
+        logger.warning("[%s] Missing API key from %s", request_id, request.remote_addr)
+        return jsonify({"error": "API key is missing", "request_id": request_id}), 401
+    
+    # Malformed keys never reach the cache or database
+    well_formed = len(api_key) <= API_KEY_MAX_LENGTH and api_key.startswith(API_KEY_PREFIX)
+    user = AuthService.get_user_by_api_key(api_key) if well_formed else None
+    if not user:
+        logger.warning("[%s] Invalid API key used from %s", request_id, request.remote_addr)
+        return jsonify({"error": "Invalid API key", "request_id": request_id}), 401
+    
+    # Check Approval
+    if not user['is_approved']:
+        logger.warning("[%s] Unapproved user %s attempted API access", request_id, user['id'])
+        return jsonify({"error": "Account pending approval", "request_id": request_id}), 403
+    
+    g.user_id = user['id']
+    g.user_email = user['email']
+    logger.info("[%s] Authenticated user: %s (%s)", request_id, g.user_email, g.user_id)
+
+def _check_admin_key(request_id):
+    logger.info("[%s] Admin request: %s %s", request_id, request.method, request.path)
+    
+    admin_key = request.headers.get('X-Admin-Key', '').encode()
+    if ADMIN_API_KEY and hmac.compare_digest(admin_key, ADMIN_API_KEY):
+        logger.info("[%s] Admin access granted", request_id)
+        return None
+    logger.warning("[%s] Failed admin access attempt from %s", request_id, request.remote_addr)
+    return jsonify({"error": "Admin access required", "request_id": request_id}), 403
 
 # --- Validation ---
 
-def validate_image_source():
-    image_file = request.files.get('image')
-    image_url = request.form.get('image_url')
+def validate_image_source(form, files):
+    image_file = files.get('image')
+    image_url = form.get('image_url')
     
-    request_id = getattr(g, 'request_id', 'unknown')
+    request_id = g.request_id
     
     if not image_file and not image_url: 
-        logger.warning(f"[{request_id}] Validation failed: No image source provided")
-        return None, "Image required"
+        return None, ("missing_image", "Image required")
     if image_file and image_url: 
-        logger.warning(f"[{request_id}] Validation failed: Both file and URL provided")
-        return None, "Cannot have both"
+        return None, ("ambiguous_image", "Cannot have both")
     
     if image_file:
         if image_file.filename == '': 
-            logger.warning(f"[{request_id}] Validation failed: Empty filename")
-            return None, "No file"
-        allowed = {'.png', '.jpg', '.jpeg', '.webp'}
-        ext = os.path.splitext(image_file.filename)[1].lower()
-        if ext not in allowed: 
-            logger.warning(f"[{request_id}] Validation failed: Invalid extension {ext}")
-            return None, "Invalid type"
+            return None, ("empty_filename", "No file")
+        _, dot, ext = image_file.filename.rpartition('.')
+        ext = ext.lower() if dot else ''
+        if ext not in ALLOWED_IMAGE_EXTENSIONS: 
+            return None, ("invalid_extension", "Invalid type")
         
-        image_file.seek(0, 2)
-        size = image_file.tell()
-        image_file.seek(0)
-        if size > 10 * 1024 * 1024: 
-            logger.warning(f"[{request_id}] Validation failed: File too large ({size} bytes)")
-            return None, "Too large"
+        # The whole request body bounds the file size; only measure the
+        # stream when the body alone could exceed the limit.
+        size = request.content_length
+        if size is None or size > MAX_UPLOAD_BYTES:
+            image_file.seek(0, 2)
+            size = image_file.tell()
+            image_file.seek(0)
+        if size > MAX_UPLOAD_BYTES: 
+            return None, ("file_too_large", "Too large")
         
-        logger.info(f"[{request_id}] Image validation passed: file={image_file.filename}, size={size} bytes")
+        logger.info("[%s] Image validation passed: file=%s, size=%s bytes", request_id, image_file.filename, size)
         return {"type": "file", "file": image_file}, None
     
     if image_url:
-        if not (image_url.startswith("gs://") or image_url.startswith("http")): 
-            logger.warning(f"[{request_id}] Validation failed: Invalid URL format: {image_url}")
-            return None, "Invalid URL"
-        logger.info(f"[{request_id}] Image validation passed: url={image_url}")
+        if not image_url[:IMAGE_URL_PREFIX_LEN].lower().startswith(IMAGE_URL_PREFIXES): 
+            return None, ("invalid_url", "Invalid URL")
+        logger.info("[%s] Image validation passed: url=%s", request_id, image_url)
         return {"type": "url", "url": image_url}, None
 
 def validate_prompt(prompt):
-    request_id = getattr(g, 'request_id', 'unknown')
-    if not prompt or len(prompt.strip()) < 3: 
-        logger.warning(f"[{request_id}] Validation failed: Invalid prompt (length={len(prompt) if prompt else 0})")
-        return None, "Invalid prompt"
+    request_id = g.request_id
+    validated = prompt.strip() if prompt else ''
+    if len(validated) < MIN_PROMPT_LENGTH: 
+        return None, ("invalid_prompt", "Invalid prompt")
     
-    validated = prompt.strip()
-    logger.info(f"[{request_id}] Prompt validated: '{validated[:100]}{'...' if len(validated) > 100 else ''}'")
+    logger.info("[%s] Prompt validated: '%s%s'", request_id, validated[:PROMPT_LOG_PREVIEW], '...' if len(validated) > PROMPT_LOG_PREVIEW else '')
     return validated, None
 
+# Per-model parameter schemas, compiled once at import. Form values arrive
+# as strings and are cast by schema type first; the compiled validator then
+# checks bounds and fills defaults for anything omitted.
+VEO_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "duration_seconds": {"type": "integer", "minimum": 1, "maximum": 8, "default": 4},
+        "resolution": {"type": "string", "enum": ["720p", "1080p"], "default": "720p"},
+        "camera_motion": {"type": "string", "default": "None"},
+        "enhance_prompt": {"type": "boolean", "default": False},
+        "aspect_ratio": {"type": "string", "enum": ["16:9", "9:16"], "default": "16:9"},
+    },
+}
+
+WAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "negative_prompt": {"type": "string", "default": "low quality"},
+        "cfg": {"type": "number", "minimum": 0, "maximum": 20, "default": 7.5},
+        "width": {"type": "integer", "minimum": 1, "default": 1280},
+        "height": {"type": "integer", "minimum": 1, "default": 720},
+        "length": {"type": "integer", "minimum": 1, "default": 81},
+        "steps": {"type": "integer", "minimum": 1, "maximum": 100, "default": 30},
+        "seed": {"type": "integer", "default": 42},
+    },
+}
+
+def _finite_float(value):
+    # float() accepts "nan"/"inf", which slip past minimum/maximum checks
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"non-finite number: {value!r}")
+    return number
+
+FORM_CASTS = {
+    "integer": int,
+    "number": _finite_float,
+    "string": str,
+    "boolean": lambda value: value.lower() in TRUE_STRINGS,
+}
+
+def _compile_parser(schema):
+    casts = {name: FORM_CASTS[prop["type"]] for name, prop in schema["properties"].items()}
+    validate = fastjsonschema.compile(schema)
+    defaults = validate({})
+
+    def parse(form_data):
+        values = {name: cast(form_data[name]) for name, cast in casts.items() if name in form_data}
+        # Most callers send no model parameters at all; skip the validator
+        if not values:
+            return dict(defaults)
+        return validate(values)
+    return parse
+
+PARAMETER_PARSERS = {
+    "veo3.1": _compile_parser(VEO_SCHEMA),
+    "wan2.1": _compile_parser(WAN_SCHEMA),
+}
+
 def validate_parameters(model, form_data):
-    request_id = getattr(g, 'request_id', 'unknown')
-    params = {}
-    errors = []
-    
+    request_id = g.request_id
+    parser = PARAMETER_PARSERS.get(model)
+    if parser is None:
+        return {}, ("unknown_model", [f"Unknown model: {model}"])
+
     try:
-        if model == "veo3.1":
-            params['duration_seconds'] = int(form_data.get('duration_seconds', 4))
-            params['resolution'] = form_data.get('resolution', '720p')
-            params['camera_motion'] = form_data.get('camera_motion', 'None')
-            params['enhance_prompt'] = form_data.get('enhance_prompt', 'false').lower() == 'true'
-            params['aspect_ratio'] = form_data.get('aspect_ratio', '16:9')
-            logger.info(f"[{request_id}] Veo 3.1 parameters: {params}")
-        elif model == "wan2.1":
-            params['negative_prompt'] = form_data.get('negative_prompt', 'low quality')
-            params['cfg'] = float(form_data.get('cfg', 7.5))
-            params['width'] = int(form_data.get('width', 1280))
-            params['height'] = int(form_data.get('height', 720))
-            params['length'] = int(form_data.get('length', 81))
-            params['steps'] = int(form_data.get('steps', 30))
-            params['seed'] = int(form_data.get('seed', 42))
-            logger.info(f"[{request_id}] Wan 2.1 parameters: {params}")
-        else:
-            errors.append(f"Unknown model: {model}")
-            logger.error(f"[{request_id}] Unknown model: {model}")
+        params = parser(form_data)
+    except fastjsonschema.JsonSchemaValueException as e:
+        return {}, ("invalid_parameter", [f"Invalid parameter: {e.message}"])
     except ValueError as e:
-        errors.append(f"Parameter type error: {e}")
-        logger.error(f"[{request_id}] Parameter validation error: {e}")
-    
-    return params, errors
+        return {}, ("parameter_type", [f"Parameter type error: {e}"])
+
+    logger.info("[%s] %s parameters: %s", request_id, model, params)
+    return params, None
 
 # --- Endpoints ---
 
 @api_bp.route('/generate', methods=['POST'])
 @api_key_required
+@api_limiter.limit(lambda: GENERATE_USER_LIMIT, key_func=_user_rate_key)
 def generate_video():
     request_id = g.request_id
-    start_time = datetime.now()
+    start_time = time.monotonic()
+    
+    logger.info("[%s] ===== GENERATE VIDEO STARTED =====", request_id)
+    logger.info("[%s] User: %s (%s)", request_id, g.user_email, g.user_id)
     
-    logger.info(f"[{request_id}] ===== GENERATE VIDEO STARTED =====")
-    logger.info(f"[{request_id}] User: {g.user_email} ({g.user_id})")
-    logger.info(f"[{request_id}] Form data: {dict(request.form)}")
-    logger.info(f"[{request_id}] Files: {list(request.files.keys())}")
+    # Oversize bodies were already refused by _body_size_gate
+    # Parsed once here and handed to every validator
+    form, files = request.form, request.files
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[%s] Form data: %s", request_id, dict(form))
+        logger.debug("[%s] Files: %s", request_id, list(files.keys()))
     
     try:
-        model = request.form.get('model', 'wan2.1')
-        logger.info(f"[{request_id}] Selected model: {model}")
-        
-        prompt, p_err = validate_prompt(request.form.get('prompt'))
-        if p_err: 
-            logger.warning(f"[{request_id}] Prompt validation failed: {p_err}")
-            return jsonify({"error": p_err, "request_id": request_id}), 400
+        model = form.get('model', 'wan2.1')
+        logger.info("[%s] Selected model: %s", request_id, model)
         
-        img_info, img_err = validate_image_source()
-        if img_err: 
-            logger.warning(f"[{request_id}] Image validation failed: {img_err}")
-            return jsonify({"error": img_err, "request_id": request_id}), 400
-        
-        params, param_err = validate_parameters(model, request.form)
-        if param_err: 
-            logger.warning(f"[{request_id}] Parameter validation failed: {param_err}")
-            return jsonify({"error": param_err, "request_id": request_id}), 400
+        prompt, error = validate_prompt(form.get('prompt'))
+        if not error:
+            img_info, error = validate_image_source(form, files)
+        if not error:
+            params, error = validate_parameters(model, form)
+        if error:
+            # Validators return (code, message) and leave logging to us
+            code, detail = error
+            logger.warning("[%s] validation_failed code=%s detail=%s", request_id, code, detail)
+            return jsonify({"error": detail, "request_id": request_id}), 400
         
         # Prepare job
         job_data = {
@@ -193,32 +348,35 @@ def generate_video():
             "parameters": params
         }
         
-        logger.info(f"[{request_id}] Job data prepared: {job_data}")
+        logger.info("[%s] Job data prepared: %s", request_id, job_data)
         
         if img_info['type'] == 'file':
             file = img_info['file']
-            temp_dir = os.path.join(os.getcwd(), 'temp_uploads')
-            os.makedirs(temp_dir, exist_ok=True)
-            filename = f"api_{uuid.uuid4()}_{file.filename}"
-            image_path = os.path.join(temp_dir, filename)
-            file.save(image_path)
+            filename = f"api_{secrets.token_hex(8)}_{secure_filename(file.filename)}"
+            image_path = os.path.join(TEMP_UPLOAD_DIR, filename)
+            with open(image_path, 'wb') as out:
+                shutil.copyfileobj(file.stream, out, UPLOAD_COPY_BUFFER)
             job_data['input_image_path'] = image_path
-            logger.info(f"[{request_id}] Image saved to temp: {image_path}")
+            logger.info("[%s] Image saved to temp: %s", request_id, image_path)
         else:
             job_data['input_image_url'] = img_info['url']
-            logger.info(f"[{request_id}] Using GCS URL: {img_info['url']}")
+            logger.info("[%s] Using GCS URL: %s", request_id, img_info['url'])
         
         # Add to Queue
-        queue = JobQueue.get_instance()
         job_id = queue.add_job(job_data)
-        logger.info(f"[{request_id}] Job added to queue: {job_id}")
+        _invalidate_user_views(g.user_id)
+        logger.info("[%s] Job added to queue: %s", request_id, job_id)
         
-        # Inform user about concurrency status
+        # Inform user about concurrency status (best-effort: the job is already queued)
         concurrency = ConcurrencyManager.get_instance()
-        user_has_active = g.user_id in concurrency.active_user_jobs
-        global_full = concurrency.active_count >= concurrency.global_limit
+        try:
+            active_count, user_has_active = concurrency.snapshot(g.user_id)
+        except Exception as e:
+            logger.warning("[%s] Concurrency snapshot failed: %s", request_id, e)
+            active_count, user_has_active = 0, False
+        global_full = active_count >= concurrency.global_limit
         
-        logger.info(f"[{request_id}] Concurrency status - User active: {user_has_active}, Global full: {global_full}, Active count: {concurrency.active_count}/{concurrency.global_limit}")
+        logger.info("[%s] Concurrency status - User active: %s, Global full: %s, Active count: %s/%s", request_id, user_has_active, global_full, active_count, concurrency.global_limit)
         
         msg = "Job accepted. Queued for processing."
         if user_has_active:
@@ -226,8 +384,8 @@ def generate_video():
         elif global_full:
             msg = "Job queued. Server capacity full. Waiting for slot."
             
-        duration = (datetime.now() - start_time).total_seconds()
-        logger.info(f"[{request_id}] ===== GENERATE VIDEO COMPLETED (took {duration:.2f}s) =====")
+        duration = time.monotonic() - start_time
+        logger.info("[%s] ===== GENERATE VIDEO COMPLETED (took %.2fs) =====", request_id, duration)
         
         return jsonify({
             "message": msg,
@@ -237,99 +395,128 @@ def generate_video():
         }), 202
         
     except Exception as e:
-        duration = (datetime.now() - start_time).total_seconds()
-        logger.error(f"[{request_id}] ===== GENERATE VIDEO FAILED after {duration:.2f}s =====")
-        logger.error(f"[{request_id}] Exception: {type(e).__name__}: {e}", exc_info=True)
+        duration = time.monotonic() - start_time
+        logger.error("[%s] ===== GENERATE VIDEO FAILED after %.2fs =====", request_id, duration)
+        logger.error("[%s] Exception: %s: %s", request_id, type(e).__name__, e, exc_info=True)
         return jsonify({"error": "Internal error", "request_id": request_id}), 500
 
 @api_bp.route('/status/<job_id>', methods=['GET'])
 @api_key_required
+@api_limiter.limit(lambda: STATUS_USER_LIMIT, key_func=_user_rate_key)
 def get_job_status(job_id):
     request_id = g.request_id
-    logger.info(f"[{request_id}] Status check for job: {job_id} | User: {g.user_email}")
+    logger.info("[%s] Status check for job: %s | User: %s", request_id, job_id, g.user_email)
     
     try:
-        job = JobQueue.get_instance().get_job(job_id)
+        job = queue.get_job(job_id)
         if not job: 
-            logger.warning(f"[{request_id}] Job not found: {job_id}")
+            logger.warning("[%s] Job not found: %s", request_id, job_id)
             return jsonify({"error": "Not found", "request_id": request_id}), 404
         
         if job.user_id != g.user_id: 
-            logger.warning(f"[{request_id}] Access denied: User {g.user_id} tried to access job {job_id} owned by {job.user_id}")
+            logger.warning("[%s] Access denied: User %s tried to access job %s owned by %s", request_id, g.user_id, job_id, job.user_id)
             return jsonify({"error": "Access denied", "request_id": request_id}), 403
         
-        logger.info(f"[{request_id}] Job status: {job.status.value} | Updated: {job.updated_at}")
-        return jsonify(job.to_dict()), 200
+        logger.info("[%s] Job status: %s | Updated: %s", request_id, job.status.value, job.updated_at)
+        etag = hashlib.blake2b(
+            f"{job.job_id}:{job.status.value}:{job.updated_at.isoformat()}".encode(), digest_size=16
+        ).hexdigest()
+        # Unchanged since the client's last poll: skip serializing the body
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = jsonify(job.to_dict())
+        response.set_etag(etag)
+        if job.status in TERMINAL_JOB_STATUSES:
+            response.cache_control.private = True
+            response.cache_control.max_age = TERMINAL_STATUS_MAX_AGE
+        return response
     except Exception as e:
-        logger.error(f"[{request_id}] Status check error: {e}", exc_info=True)
+        logger.error("[%s] Status check error: %s", request_id, e, exc_info=True)
         return jsonify({"error": "Internal error", "request_id": request_id}), 500
 
 @api_bp.route('/cancel/<job_id>', methods=['POST'])
 @api_key_required
 def cancel_job(job_id):
     request_id = g.request_id
-    logger.info(f"[{request_id}] Cancel request for job: {job_id} | User: {g.user_email}")
+    logger.info("[%s] Cancel request for job: %s | User: %s", request_id, job_id, g.user_email)
     
     try:
-        job = JobQueue.get_instance().get_job(job_id)
+        job = queue.get_job(job_id)
         if not job: 
-            logger.warning(f"[{request_id}] Job not found for cancellation: {job_id}")
+            logger.warning("[%s] Job not found for cancellation: %s", request_id, job_id)
             return jsonify({"error": "Not found", "request_id": request_id}), 404
         
         if job.user_id != g.user_id: 
-            logger.warning(f"[{request_id}] Access denied for cancellation: {job_id}")
+            logger.warning("[%s] Access denied for cancellation: %s", request_id, job_id)
             return jsonify({"error": "Access denied", "request_id": request_id}), 403
         
         if job.status == JobStatus.PROCESSING:
-            logger.info(f"[{request_id}] Releasing concurrency slot for processing job")
+            logger.info("[%s] Releasing concurrency slot for processing job", request_id)
             ConcurrencyManager.get_instance().release(job.user_id, job.job_id)
             
-        success = JobQueue.get_instance().cancel_job(job_id)
+        success = queue.cancel_job(job_id)
         if success:
-            logger.info(f"[{request_id}] Job cancelled successfully")
+            _invalidate_user_views(g.user_id)
+            logger.info("[%s] Job cancelled successfully", request_id)
             return jsonify({"message": "Cancelled", "request_id": request_id}), 200
         
-        logger.warning(f"[{request_id}] Cannot cancel job (status={job.status.value})")
+        logger.warning("[%s] Cannot cancel job (status=%s)", request_id, job.status.value)
         return jsonify({"error": "Cannot cancel", "request_id": request_id}), 400
     except Exception as e:
-        logger.error(f"[{request_id}] Cancel error: {e}", exc_info=True)
+        logger.error("[%s] Cancel error: %s", request_id, e, exc_info=True)
         return jsonify({"error": "Internal error", "request_id": request_id}), 500
 
 @api_bp.route('/history', methods=['GET'])
 @api_key_required
 def get_history():
     request_id = g.request_id
-    limit = int(request.args.get('limit', 20))
-    logger.info(f"[{request_id}] History request for user {g.user_email} (limit={limit})")
+    # Non-integer limits fall back to the default; the range is clamped
+    # before the cache lookup so every cached key is a valid page size
+    limit = request.args.get('limit', 20, type=int)
+    limit = min(max(limit, 1), HISTORY_CACHE_MAX_LIMIT)
+    logger.info("[%s] History request for user %s (limit=%s)", request_id, g.user_email, limit)
     
     try:
-        jobs = JobQueue.get_instance().get_user_jobs(g.user_id, limit)
-        logger.info(f"[{request_id}] Returning {len(jobs)} jobs")
+        with _user_cache_lock:
+            jobs = _history_cache.get(g.user_id, {}).get(limit)
+        if jobs is None:
+            jobs = queue.get_user_jobs(g.user_id, limit)
+            with _user_cache_lock:
+                _history_cache.setdefault(g.user_id, {})[limit] = jobs
+        logger.info("[%s] Returning %s jobs", request_id, len(jobs))
         return jsonify({"jobs": jobs, "request_id": request_id}), 200
     except Exception as e:
-        logger.error(f"[{request_id}] History error: {e}", exc_info=True)
+        logger.error("[%s] History error: %s", request_id, e, exc_info=True)
         return jsonify({"error": "Internal error", "request_id": request_id}), 500
 
 @api_bp.route('/usage', methods=['GET'])
 @api_key_required
 def get_usage():
     request_id = g.request_id
-    logger.info(f"[{request_id}] Usage request for user {g.user_email}")
+    logger.info("[%s] Usage request for user %s", request_id, g.user_email)
     
     try:
-        from datetime import datetime, timedelta
-        jobs = JobQueue.get_instance().get_user_jobs(g.user_id, 1000)
-        now = datetime.now()
-        recent = len([j for j in jobs if datetime.fromisoformat(j['created_at']) > now - timedelta(hours=24)])
-        usage = {
-            "total_jobs": len(jobs),
-            "recent_24h": recent,
-            "credits_remaining": max(0, 500 - recent)
-        }
-        logger.info(f"[{request_id}] Usage data: {usage}")
+        with _user_cache_lock:
+            usage = _usage_cache.get(g.user_id)
+        if usage is None:
+            counts = queue.get_user_usage(g.user_id, datetime.now() - timedelta(hours=24))
+            by_status = counts["by_status"]
+            recent = counts["recent"]
+            usage = {
+                "total_jobs": counts["total"],
+                "completed": by_status.get(JobStatus.COMPLETED.value, 0),
+                "failed": by_status.get(JobStatus.FAILED.value, 0),
+                "queued": by_status.get(JobStatus.QUEUED.value, 0),
+                "recent_24h": recent,
+                "credits_remaining": max(0, 500 - recent)
+            }
+            with _user_cache_lock:
+                _usage_cache[g.user_id] = usage
+        logger.info("[%s] Usage data: %s", request_id, usage)
         return jsonify({**usage, "request_id": request_id}), 200
     except Exception as e:
-        logger.error(f"[{request_id}] Usage error: {e}", exc_info=True)
+        logger.error("[%s] Usage error: %s", request_id, e, exc_info=True)
         return jsonify({"error": "Internal error", "request_id": request_id}), 500
 
 # --- Admin Endpoints ---
@@ -337,48 +524,47 @@ def get_usage():
 @api_bp.route('/admin/pending', methods=['GET'])
 @admin_required
 def admin_pending():
-    request_id = g.request_id if hasattr(g, 'request_id') else 'admin'
-    logger.info(f"[{request_id}] Admin pending users request")
+    request_id = g.request_id
+    logger.info("[%s] Admin pending users request", request_id)
     
     try:
         result = AuthService.list_pending_users()
-        logger.info(f"[{request_id}] Pending users: {result}")
+        logger.info("[%s] Pending users: %s", request_id, result)
         return jsonify({"users": result, "request_id": request_id}), 200
     except Exception as e:
-        logger.error(f"[{request_id}] Admin pending error: {e}", exc_info=True)
+        logger.error("[%s] Admin pending error: %s", request_id, e, exc_info=True)
         return jsonify({"error": str(e), "request_id": request_id}), 500
 
 @api_bp.route('/admin/approve/<user_id>', methods=['POST'])
 @admin_required
 def admin_approve(user_id):
-    request_id = g.request_id if hasattr(g, 'request_id') else 'admin'
-    logger.info(f"[{request_id}] Admin approval for user: {user_id}")
+    request_id = g.request_id
+    logger.info("[%s] Admin approval for user: %s", request_id, user_id)
     
     if AuthService.approve_user(user_id):
-        logger.info(f"[{request_id}] User {user_id} approved successfully")
+        logger.info("[%s] User %s approved successfully", request_id, user_id)
         return jsonify({"message": "Approved", "request_id": request_id}), 200
     
-    logger.warning(f"[{request_id}] Failed to approve user {user_id}")
+    logger.warning("[%s] Failed to approve user %s", request_id, user_id)
     return jsonify({"error": "Failed", "request_id": request_id}), 404
 
 @api_bp.route('/admin/stats', methods=['GET'])
 @admin_required
 def admin_stats():
     """Get comprehensive admin stats including queue and concurrency."""
-    request_id = g.request_id if hasattr(g, 'request_id') else 'admin'
-    logger.info(f"[{request_id}] Admin stats request")
+    request_id = g.request_id
+    logger.info("[%s] Admin stats request", request_id)
     
     try:
         concurrency = ConcurrencyManager.get_instance().get_status()
-        queue = JobQueue.get_instance()
         queue_stats = queue.get_queue_stats()
         
         stats = {
             **concurrency,
             **queue_stats
         }
-        logger.info(f"[{request_id}] Stats returned: {stats}")
+        logger.info("[%s] Stats returned: %s", request_id, stats)
         return jsonify({**stats, "request_id": request_id}), 200
     except Exception as e:
-        logger.error(f"[{request_id}] Admin stats error: {e}", exc_info=True)
+        logger.error("[%s] Admin stats error: %s", request_id, e, exc_info=True)
         return jsonify({"error": str(e), "request_id": request_id}), 500
@@ -1,41 +1,241 @@
 import os
 import uuid
-from datetime import datetime
-from supabase import create_client, Client
-
-# Global supabase clients
-_supabase_client: Client = None
-_supabase_admin: Client = None
-
+import secrets
+import atexit
+import hashlib
+import functools
+import logging
+import threading
+import time
+from collections.abc import MutableMapping
+from queue import Queue, Empty
+import httpx
+from cachetools import TTLCache
+from supabase import create_client, ClientOptions
+
+logger = logging.getLogger("vividflow")
+
+# Pooled keep-alive HTTP transport shared by each Supabase client's
+# PostgREST/auth calls, so queries reuse connections instead of handshaking.
+SUPABASE_HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30)
+SUPABASE_HTTP_TIMEOUT = httpx.Timeout(5.0, connect=2.0)
+_http_clients = []
+
+def _create_client(url, key):
+    http_client = httpx.Client(
+        limits=SUPABASE_HTTP_LIMITS,
+        timeout=SUPABASE_HTTP_TIMEOUT,
+        http2=True,
+        follow_redirects=True,
+    )
+    _http_clients.append(http_client)
+    return create_client(url, key, options=ClientOptions(httpx_client=http_client))
+
+@functools.lru_cache(maxsize=1)
 def get_supabase():
-    global _supabase_client
-    if _supabase_client is None:
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_KEY")
-        if url and key:
-            _supabase_client = create_client(url, key)
-        else:
-            print("Warning: Supabase credentials not found. Using mock implementation.")
-    return _supabase_client
-
+    url: str = os.environ.get("SUPABASE_URL")
+    key: str = os.environ.get("SUPABASE_KEY")
+    if url and key:
+        return _create_client(url, key)
+    print("Warning: Supabase credentials not found. Using mock implementation.")
+    return None
+
+@functools.lru_cache(maxsize=1)
 def get_supabase_admin():
-    global _supabase_admin
-    if _supabase_admin is None:
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_SERVICE_KEY")
-        
-        if key:
-            print(f"DEBUG: Admin client initialized.")
-        else:
-            print("DEBUG: SUPABASE_SERVICE_KEY missing, falling back to anon key.")
-            key = os.environ.get("SUPABASE_KEY")
+    """Returns a Supabase client with Service Role privileges (bypasses RLS)."""
+    url: str = os.environ.get("SUPABASE_URL")
+    key: str = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_KEY")
+    if url and key:
+        return _create_client(url, key)
+    return get_supabase()
+
+@atexit.register
+def close_supabase():
+    """Close the pooled connections and drop the cached clients; the next
+    get_supabase()/get_supabase_admin() call builds fresh ones."""
+    get_supabase.cache_clear()
+    get_supabase_admin.cache_clear()
+    while _http_clients:
+        _http_clients.pop().close()
+
+# Every issued API key starts with this and fits in API_KEY_MAX_LENGTH
+# (legacy uuid4 keys included); anything else can be rejected without a lookup.
+API_KEY_PREFIX = "vivid-api-key-"
+API_KEY_MAX_LENGTH = 64
+
+# Reverse indexes into MOCK_USERS (user_id -> email, api_key -> email).
+# Single-key reads and writes are atomic; _mock_lock serialises the
+# multi-step updates (user replacement, key rotation) across request threads.
+MOCK_BY_ID = {}
+MOCK_BY_APIKEY = {}
+_mock_lock = threading.RLock()
+
+class _MockUserStore(MutableMapping):
+    """email -> user mapping that keeps the reverse indexes in step with every
+    write. It wraps a dict rather than subclassing one, so every mutator
+    (setdefault, popitem, update, |=, ...) goes through __setitem__ or
+    __delitem__. Changing a user's api_key in place must update
+    MOCK_BY_APIKEY itself (see generate_api_key)."""
 
-        if url and key:
-            _supabase_admin = create_client(url, key)
-    return _supabase_admin or get_supabase()
+    def __init__(self):
+        self._users = {}
+
+    def __getitem__(self, email):
+        return self._users[email]
+
+    def __iter__(self):
+        return iter(self._users)
+
+    def __len__(self):
+        return len(self._users)
+
+    def _unindex(self, email):
+        user = self._users.get(email)
+        if user is not None:
+            MOCK_BY_ID.pop(user["user_id"], None)
+            MOCK_BY_APIKEY.pop(user.get("api_key"), None)
+
+    def __setitem__(self, email, user):
+        with _mock_lock:
+            self._unindex(email)
+            self._users[email] = user
+            MOCK_BY_ID[user["user_id"]] = email
+            if user.get("api_key"):
+                MOCK_BY_APIKEY[user["api_key"]] = email
+
+    def __delitem__(self, email):
+        with _mock_lock:
+            self._unindex(email)
+            del self._users[email]
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        with _mock_lock:
+            self._users.clear()
+            MOCK_BY_ID.clear()
+            MOCK_BY_APIKEY.clear()
 
 # Mock Database
-MOCK_USERS = {}
+MOCK_USERS = _MockUserStore()
+
+def _mock_user_by_id(user_id):
+    """Returns (email, user) from the mock DB, or (None, None)."""
+    email = MOCK_BY_ID.get(user_id)
+    return email, MOCK_USERS.get(email)
+
+def _mock_user_by_api_key(api_key):
+    """Returns (email, user) from the mock DB, or (None, None)."""
+    email = MOCK_BY_APIKEY.get(api_key)
+    return email, MOCK_USERS.get(email)
+
+# Short-lived profile caches so authenticated API requests don't hit Supabase
+# on every call. Keyed by API key digest (raw keys are never held) and by
+# user id respectively.
+PROFILE_CACHE_TTL = 60
+_api_key_cache = TTLCache(maxsize=10_000, ttl=PROFILE_CACHE_TTL)
+_user_id_cache = TTLCache(maxsize=10_000, ttl=PROFILE_CACHE_TTL)
+_cache_lock = threading.RLock()
+
+# Digests of keys Supabase didn't recognise, so retries with a revoked or
+# mistyped key don't each cost a query. Issued keys are random, so a fresh
+# key can't collide with an entry here.
+UNKNOWN_KEY_CACHE_TTL = 10
+_unknown_api_key_cache = TTLCache(maxsize=10_000, ttl=UNKNOWN_KEY_CACHE_TTL)
+
+# Column projections for the hot queries
+API_KEY_PROFILE_COLUMNS = 'id,email,is_approved'
+API_KEY_PROFILE_FIELDS = tuple(API_KEY_PROFILE_COLUMNS.split(','))
+PROFILE_COLUMNS = 'id,email,is_approved,is_admin,api_key'
+PENDING_USER_COLUMNS = 'id,email'
+HISTORY_COLUMNS = 'id,created_at,prompt,video_url,status'
+
+# Default and maximum number of history entries returned per page
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 100
+
+def _api_key_digest(api_key):
+    return hashlib.sha256(api_key.encode()).digest()
+
+def invalidate_user_cache(user_id):
+    """Drop every cached profile entry belonging to user_id."""
+    with _cache_lock:
+        _user_id_cache.pop(user_id, None)
+        stale_keys = [k for k, p in _api_key_cache.items() if p.get('id') == user_id]
+        for k in stale_keys:
+            _api_key_cache.pop(k, None)
+
+# History rows are written off the request path: add_history enqueues and a
+# background thread inserts whatever has accumulated in one PostgREST call.
+# Reads are therefore eventually consistent: a history request made right
+# after a generation can miss the newest row.
+HISTORY_BATCH_SIZE = 50
+HISTORY_BATCH_WAIT = 0.1  # seconds to wait for more rows before flushing
+HISTORY_RETRY_DELAY = 1.0  # seconds before the single retry of a failed insert
+HISTORY_FLUSH_TIMEOUT = 10  # seconds flush_history waits for the writer's batch
+
+_history_queue = Queue()
+_history_writer = None
+_history_writer_lock = threading.Lock()
+
+def _insert_history_batch(batch):
+    """Insert a batch, retrying once, then mark its rows done in the queue."""
+    try:
+        for attempt in range(2):
+            try:
+                get_supabase_admin().table('history').insert(batch).execute()
+                return True
+            except Exception as e:
+                if attempt:
+                    logger.error("History batch insert failed, dropping %s rows: %s", len(batch), e)
+                    return False
+                logger.warning("History batch insert failed (%s rows), retrying: %s", len(batch), e)
+                time.sleep(HISTORY_RETRY_DELAY)
+    finally:
+        for _ in batch:
+            _history_queue.task_done()
+
+def _drain_history_queue(batch):
+    try:
+        while len(batch) < HISTORY_BATCH_SIZE:
+            batch.append(_history_queue.get(timeout=HISTORY_BATCH_WAIT))
+    except Empty:
+        pass
+    return batch
+
+def _history_writer_loop():
+    while True:
+        _insert_history_batch(_drain_history_queue([_history_queue.get()]))
+
+def _ensure_history_writer():
+    global _history_writer
+    if _history_writer is not None:
+        return
+    with _history_writer_lock:
+        if _history_writer is None:
+            _history_writer = threading.Thread(target=_history_writer_loop, name="history-writer", daemon=True)
+            _history_writer.start()
+
+@atexit.register
+def flush_history():
+    """Synchronously write any history rows still waiting in the queue, then
+    wait (bounded) for the batch the writer thread is inserting."""
+    batch = []
+    while True:
+        try:
+            batch.append(_history_queue.get_nowait())
+        except Empty:
+            break
+        if len(batch) == HISTORY_BATCH_SIZE:
+            _insert_history_batch(batch)
+            batch = []
+    if batch:
+        _insert_history_batch(batch)
+    # Every dequeued row is acknowledged once its insert finishes
+    with _history_queue.all_tasks_done:
+        _history_queue.all_tasks_done.wait_for(lambda: not _history_queue.unfinished_tasks, HISTORY_FLUSH_TIMEOUT)
 
 class AuthService:
     def __init__(self):
@@ -106,88 +306,140 @@ class AuthService:
     def generate_api_key(user_id):
         client = get_supabase_admin()
         if not client:
-            new_key = f"vivid-api-key-{uuid.uuid4()}"
-            for email, user in MOCK_USERS.items():
-                if user["user_id"] == user_id:
-                    user["api_key"] = new_key
-                    return new_key
-            return None
+            new_key = f"{API_KEY_PREFIX}{secrets.token_urlsafe(24)}"
+            email, user = _mock_user_by_id(user_id)
+            if user is None:
+                return None
+            with _mock_lock:
+                MOCK_BY_APIKEY.pop(user.get("api_key"), None)
+                user["api_key"] = new_key
+                MOCK_BY_APIKEY[new_key] = email
+            return new_key
 
-        new_key = f"vivid-api-key-{uuid.uuid4()}"
+        new_key = f"{API_KEY_PREFIX}{secrets.token_urlsafe(24)}"
         try:
-            res = client.table('profiles').select('*').eq('id', user_id).single().execute()
+            # Single round-trip: updates the key, or creates the profile if missing
+            res = client.table('profiles').upsert(
+                {'id': user_id, 'api_key': new_key},
+                on_conflict='id'
+            ).execute()
         except Exception:
-            try:
-                client.table('profiles').insert({'id': user_id, 'api_key': new_key, 'is_approved': True}).execute()
-                return new_key
-            except Exception:
-                return None
+            return None
+        if not res.data:
+            return None
 
-        res = client.table('profiles').update({'api_key': new_key}).eq('id', user_id).execute()
-        return new_key if res.data else None
+        # Old key must stop working immediately; seed the new one
+        invalidate_user_cache(user_id)
+        # Cache only what get_user_by_api_key selects; never the raw key
+        profile = {field: res.data[0].get(field) for field in API_KEY_PROFILE_FIELDS}
+        digest = _api_key_digest(new_key)
+        with _cache_lock:
+            _unknown_api_key_cache.pop(digest, None)
+            if profile.get('is_approved', False):
+                _api_key_cache[digest] = profile
+        return new_key
     
     @staticmethod
     def get_user_by_api_key(api_key):
         client = get_supabase_admin()
         if not client:
-            for email, user in MOCK_USERS.items():
-                if user.get("api_key") == api_key and user.get("is_approved", False):
-                    return {"email": email, **user}
-            return None
+            email, user = _mock_user_by_api_key(api_key)
+            if user is None or not user.get("is_approved", False):
+                return None
+            return {"id": user["user_id"], "email": email, **user}
             
+        digest = _api_key_digest(api_key)
+        with _cache_lock:
+            cached = _api_key_cache.get(digest)
+            if cached is None and digest in _unknown_api_key_cache:
+                return None
+        if cached is not None:
+            return cached
+
         try:
-            res = client.table('profiles').select('*').eq('api_key', api_key).single().execute()
-            # Check approval
-            if res.data and res.data.get('is_approved', False):
-                return res.data
-            return None
+            # maybe_single() yields None for unknown keys instead of raising;
+            # relies on idx_profiles_api_key (schema.sql) to avoid a table scan
+            res = client.table('profiles').select(API_KEY_PROFILE_COLUMNS).eq('api_key', api_key).maybe_single().execute()
         except Exception:
             return None
+        if not res or not res.data:
+            with _cache_lock:
+                _unknown_api_key_cache[digest] = True
+            return None
+        # Check approval
+        if not res.data.get('is_approved', False):
+            return None
+        with _cache_lock:
+            _api_key_cache[digest] = res.data
+        return res.data
 
     @staticmethod
     def get_user_by_id(user_id):
         client = get_supabase_admin()
         if not client:
-            for email, user in MOCK_USERS.items():
-                if user["user_id"] == user_id:
-                    return {"email": email, **user}
-            return None
+            email, user = _mock_user_by_id(user_id)
+            return {"email": email, **user} if user else None
             
-        try:
-            res = client.table('profiles').select('*').eq('id', user_id).single().execute()
-            return res.data if res.data else None
-        except Exception as e:
-            if 'PGRST116' in str(e) or '0 rows' in str(e):
-                return None
-            raise
+        with _cache_lock:
+            cached = _user_id_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        res = client.table('profiles').select(PROFILE_COLUMNS).eq('id', user_id).maybe_single().execute()
+        if not res or not res.data:
+            return None
+        with _cache_lock:
+            _user_id_cache[user_id] = res.data
+        return res.data
 
     @staticmethod
     def add_history(user_id, entry):
+        """Record a generation. With Supabase the row is queued for the
+        background writer, so True means accepted, not yet readable."""
         client = get_supabase_admin()
         if not client:
-            for email, user in MOCK_USERS.items():
-                if user["user_id"] == user_id:
-                    entry["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    user["history"].insert(0, entry)
-                    return True
-            return False
+            _, user = _mock_user_by_id(user_id)
+            if user is None:
+                return False
+            entry["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            user["history"].insert(0, entry)
+            return True
             
         entry['user_id'] = user_id
         if 'timestamp' in entry: del entry['timestamp']
-        res = client.table('history').insert(entry).execute()
-        return bool(res.data)
+        _ensure_history_writer()
+        _history_queue.put(entry)
+        return True
 
     @staticmethod
-    def get_history(user_id):
+    def get_history(user_id, page_size=HISTORY_PAGE_SIZE, cursor=None):
+        """Return (entries, next_cursor), newest first. Pass next_cursor back
+        to fetch the following page; it is None on the last page."""
         client = get_supabase_admin()
         if not client:
-            for email, user in MOCK_USERS.items():
-                if user["user_id"] == user_id:
-                    return user["history"]
-            return []
-
-        res = client.table('history').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
-        return res.data if res.data else []
+            _, user = _mock_user_by_id(user_id)
+            if user is None:
+                return [], None
+            offset = int(cursor) if cursor else 0
+            end = offset + page_size
+            return user["history"][offset:end], (str(end) if end < len(user["history"]) else None)
+
+        # Keyset pagination: seek past the last seen (created_at, id) rather
+        # than OFFSET, so rows sharing a timestamp at a page boundary are not
+        # skipped; fetch one extra row to learn whether another page exists.
+        query = client.table('history').select(HISTORY_COLUMNS).eq('user_id', user_id)
+        if cursor:
+            created_at, _, last_id = cursor.rpartition('|')
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt.{int(last_id)})'
+            )
+        res = query.order('created_at', desc=True).order('id', desc=True).limit(page_size + 1).execute()
+        rows = res.data or []
+        if len(rows) > page_size:
+            last = rows[page_size - 1]
+            return rows[:page_size], f"{last['created_at']}|{last['id']}"
+        return rows, None
 
     # --- Admin Functions ---
 
@@ -201,42 +453,44 @@ class AuthService:
                     pending.append({"id": user["user_id"], "email": email})
             return pending
 
-        # Get pending profiles
-        res = client.table('profiles').select('*').eq('is_approved', False).execute()
+        # handle_new_user copies the auth email onto the profile at signup, so
+        # one profiles query covers the listing without joining auth.users.
+        res = client.table('profiles').select(PENDING_USER_COLUMNS).eq('is_approved', False).execute()
         profiles = res.data if res.data else []
-
-        # Try to get emails - requires joining with auth.users
-        # Since we can't directly query auth.users from Python SDK easily,
-        # we'll return what we have and the frontend can try to map emails
-        # For now, we just return user IDs (which is what the current template expects)
-        # The admin will need to know which user ID corresponds to which email
-
-        # If you want to see emails, you need to:
-        # 1. Create a view in Supabase that joins auth.users with profiles
-        # 2. OR check your Supabase dashboard for pending users
         return profiles
 
     @staticmethod
-    def approve_user(user_id):
+    def approve_users(user_ids):
+        """Approve several users in one UPDATE; returns how many were approved."""
+        if not user_ids:
+            return 0
         client = get_supabase_admin()
         if not client:
-            for email, user in MOCK_USERS.items():
-                if user["user_id"] == user_id:
+            approved = 0
+            for user_id in user_ids:
+                _, user = _mock_user_by_id(user_id)
+                if user is not None:
                     user["is_approved"] = True
-                    return True
-            return False
-            
+                    approved += 1
+            return approved
+
         try:
-            res = client.table('profiles').update({'is_approved': True}).eq('id', user_id).execute()
-            return bool(res.data)
+            res = client.table('profiles').update({'is_approved': True}).in_('id', list(user_ids)).execute()
         except Exception:
-            return False
+            return 0
+        for user_id in user_ids:
+            invalidate_user_cache(user_id)
+        return len(res.data or [])
+
+    @staticmethod
+    def approve_user(user_id):
+        return AuthService.approve_users([user_id]) == 1
 
     @staticmethod
     def is_user_approved(user_id):
-        """Quick check for approval status."""
+        """Quick check for approval status, served from the profile TTL cache."""
         user = AuthService.get_user_by_id(user_id)
-        return user and user.get('is_approved', False)
+        return bool(user and user.get('is_approved', False))
 
     @staticmethod
     def get_queue_stats():
@@ -244,24 +498,13 @@ class AuthService:
         from job_queue import JobQueue
         from concurrency_manager import ConcurrencyManager
 
-        queue = JobQueue.get_instance()
-        concurrency = ConcurrencyManager.get_instance()
-
-        # Get all jobs and filter by status
-        all_jobs = queue.get_all_jobs()
-        queued_jobs = [j for j in all_jobs if j['status'] == 'QUEUED']
-        processing_jobs = [j for j in all_jobs if j['status'] == 'PROCESSING']
-        completed_jobs = [j for j in all_jobs if j['status'] == 'COMPLETED']
-        failed_jobs = [j for j in all_jobs if j['status'] == 'FAILED']
+        stats = JobQueue.get_instance().get_queue_stats()
+        concurrency = ConcurrencyManager.get_instance().get_status()
 
         return {
-            "queued": len(queued_jobs),
-            "processing": len(processing_jobs),
-            "completed": len(completed_jobs),
-            "failed": len(failed_jobs),
-            "total": len(all_jobs),
-            "global_active": concurrency.active_count,
-            "global_limit": concurrency.global_limit,
-            "active_users": len(concurrency.active_user_jobs)
+            **stats,
+            "global_active": concurrency["global_active"],
+            "global_limit": concurrency["global_limit"],
+            "active_users": len(concurrency["active_users"])
         }
 
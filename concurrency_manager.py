@@ -1,5 +1,38 @@
+import os
+import logging
 import threading
-from typing import Dict, Optional
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger("vividflow")
+
+# Number of per-user lock shards; unrelated users rarely contend
+USER_LOCK_SHARDS = 16
+
+# Shared slot bookkeeping for multi-worker deployments (omit for per-process memory)
+CONCURRENCY_REDIS_URL = os.getenv("REDIS_URL", "")
+# Slots older than this are treated as leaked by a dead worker and reclaimed
+SLOT_STALE_SECONDS = int(os.getenv("CONCURRENCY_SLOT_TTL", "3600"))
+# Hash tag keeps both keys in one cluster slot so the script may touch them
+GLOBAL_SLOTS_KEY = "{concurrency}:global"
+USER_SLOTS_KEY = "{concurrency}:user:"
+# Seconds to wait on Redis before falling back to per-process slots
+REDIS_TIMEOUT = 2
+
+# KEYS: global set, user set. ARGV: now, stale seconds, member, user limit, global limit
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local stale = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - stale)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - stale)
+if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[4]) then return 0 end
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[5]) then return 0 end
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('ZADD', KEYS[2], now, ARGV[3])
+redis.call('EXPIRE', KEYS[1], stale)
+redis.call('EXPIRE', KEYS[2], stale)
+return 1
+"""
 
 class ConcurrencyManager:
     """
@@ -8,11 +41,21 @@ class ConcurrencyManager:
     Limits:
     - Global: 5 concurrent jobs
     - Per User: 1 concurrent job
+
+    Per-user state is guarded by sharded locks; only the global counter
+    update takes the shared count lock. When REDIS_URL points at Redis,
+    slots live in sorted sets instead so every worker process shares them,
+    and admission runs as one Lua script. If Redis errors, calls fall back
+    to the per-process slots rather than failing jobs.
     """
     _instance = None
     _lock = threading.Lock()
 
     def __new__(cls):
+        # Fast path: no lock once the instance exists
+        instance = cls._instance
+        if instance is not None:
+            return instance
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super(ConcurrencyManager, cls).__new__(cls)
@@ -21,57 +64,131 @@ class ConcurrencyManager:
 
     def _initialize(self):
         self.global_limit = 5
+        self.user_limit = 1
         self.active_count = 0
         self.active_user_jobs: Dict[str, str] = {}  # user_id -> job_id
-        
+        self._count_lock = threading.Lock()
+        self._user_locks = [threading.Lock() for _ in range(USER_LOCK_SHARDS)]
+        self._redis = None
+        self._acquire_script = None
+        self._redis_error = ()
+        if CONCURRENCY_REDIS_URL.startswith(("redis://", "rediss://")):
+            import redis
+            self._redis = redis.Redis.from_url(
+                CONCURRENCY_REDIS_URL, decode_responses=True,
+                socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT,
+            )
+            self._redis_error = redis.RedisError
+            # register_script runs via EVALSHA and reloads the script on NOSCRIPT
+            self._acquire_script = self._redis.register_script(ACQUIRE_SCRIPT)
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        return self._user_locks[hash(user_id) % USER_LOCK_SHARDS]
+
+    @staticmethod
+    def _slot_member(user_id: str, job_id: str) -> str:
+        return f"{user_id}:{job_id}"
+
     @classmethod
     def get_instance(cls):
         """Get the singleton instance."""
         return cls()
 
     def check_limits(self, user_id: str) -> bool:
-        """Check if user can start a new job without acquiring it."""
-        with self._lock:
-            if user_id in self.active_user_jobs:
-                return False
-            if self.active_count >= self.global_limit:
-                return False
-            return True
+        """Check if user can start a new job without acquiring it (advisory)."""
+        active_count, user_has_active = self.snapshot(user_id)
+        if user_has_active:
+            return False
+        return active_count < self.global_limit
+
+    def try_acquire(self, user_id: str, job_id: str, limit: Optional[int] = None) -> bool:
+        """
+        Atomically claim a shared Redis slot for a job.
+        `limit` overrides the global limit; the per-user limit always applies.
+        """
+        result = self._acquire_script(
+            keys=[GLOBAL_SLOTS_KEY, USER_SLOTS_KEY + user_id],
+            args=[time.time(), SLOT_STALE_SECONDS, self._slot_member(user_id, job_id),
+                  self.user_limit, limit or self.global_limit],
+        )
+        return result == 1
 
     def acquire(self, user_id: str, job_id: str) -> bool:
         """
         Attempt to acquire a slot for a job.
         Returns True if acquired, False if limits are hit.
         """
-        with self._lock:
+        if self._redis is not None:
+            try:
+                return self.try_acquire(user_id, job_id)
+            except self._redis_error as e:
+                logger.warning("Redis acquire failed, using local slots: %s", e)
+
+        with self._user_lock(user_id):
             # User already has an active job
             if user_id in self.active_user_jobs:
                 return False
             
-            # Global limit reached
-            if self.active_count >= self.global_limit:
-                return False
-            
+            with self._count_lock:
+                # Global limit reached
+                if self.active_count >= self.global_limit:
+                    return False
+                self.active_count += 1
+
             # Acquire slot
-            self.active_count += 1
             self.active_user_jobs[user_id] = job_id
             return True
 
     def release(self, user_id: str, job_id: str):
         """Release a slot when a job completes or fails."""
-        with self._lock:
-            if user_id in self.active_user_jobs:
-                if self.active_user_jobs[user_id] == job_id:
-                    del self.active_user_jobs[user_id]
-                    self.active_count -= 1
-                    if self.active_count < 0:
-                        self.active_count = 0
+        if self._redis is not None:
+            member = self._slot_member(user_id, job_id)
+            try:
+                pipe = self._redis.pipeline()
+                pipe.zrem(GLOBAL_SLOTS_KEY, member)
+                pipe.zrem(USER_SLOTS_KEY + user_id, member)
+                pipe.execute()
+            except self._redis_error as e:
+                # The stale-slot sweep reclaims it once Redis is back
+                logger.warning("Redis release failed for %s: %s", member, e)
+
+        # Also covers slots taken locally while Redis was unavailable
+        with self._user_lock(user_id):
+            if self.active_user_jobs.get(user_id) == job_id:
+                del self.active_user_jobs[user_id]
+                with self._count_lock:
+                    self.active_count = max(0, self.active_count - 1)
+
+    def snapshot(self, user_id: str) -> Tuple[int, bool]:
+        """
+        Lock-free advisory read of (active_count, user_has_active_job).
+        Suitable for user-facing messages, not for admission decisions.
+        """
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                pipe.zcard(GLOBAL_SLOTS_KEY)
+                pipe.zcard(USER_SLOTS_KEY + user_id)
+                active_count, user_active = pipe.execute()
+                return active_count, user_active > 0
+            except self._redis_error as e:
+                logger.warning("Redis snapshot failed, using local slots: %s", e)
+        return self.active_count, user_id in self.active_user_jobs
 
     def get_status(self):
         """Get current concurrency status for monitoring."""
-        with self._lock:
-            return {
-                "global_active": self.active_count,
-                "global_limit": self.global_limit,
-                "active_users": list(self.active_user_jobs.keys())
-            }
+        if self._redis is not None:
+            try:
+                members = self._redis.zrange(GLOBAL_SLOTS_KEY, 0, -1)
+                return {
+                    "global_active": len(members),
+                    "global_limit": self.global_limit,
+                    "active_users": list({m.rpartition(":")[0] for m in members})
+                }
+            except self._redis_error as e:
+                logger.warning("Redis status failed, using local slots: %s", e)
+        return {
+            "global_active": self.active_count,
+            "global_limit": self.global_limit,
+            "active_users": list(self.active_user_jobs)
+        }
@@ -7,23 +7,102 @@ Run this before attempting video generation to verify everything is configured c
 import os
 import sys
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from importlib.metadata import version, PackageNotFoundError
+from importlib.util import find_spec
+
+_ENV_LOADED = False
 
 def load_env():
-    """Load environment variables from .env file if it exists."""
+    """Load environment variables from .env file if it exists (once per process)."""
+    global _ENV_LOADED
+    if _ENV_LOADED:
+        return
+    _ENV_LOADED = True
     env_path = ".env"
     if os.path.exists(env_path):
         print("Loading environment from .env file...")
+        parsed = {}
         with open(env_path, 'r') as f:
             for line in f:
                 line = line.strip()
-                if line and not line.startswith('#'):
-                    if '=' in line:
-                        key, value = line.split('=', 1)
-                        key = key.strip()
-                        value = value.strip()
-                        if key not in os.environ:
-                            os.environ[key] = value
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    parsed[key.strip()] = value.strip()
+        # Variables already set in the real environment win
+        os.environ.update({k: v for k, v in parsed.items() if k not in os.environ})
+
+def probe_storage():
+    """Check GCS access through StorageService."""
+    lines, issues = [], []
+    try:
+        from storage_service import StorageService
+        ss = StorageService()
+        lines.append("   ✓ StorageService initialized")
+        
+        # Try to list buckets (read-only test)
+        try:
+            buckets = list(ss.client.list_buckets(max_results=1))
+            if buckets:
+                lines.append(f"   ✓ Can access GCS (bucket: {buckets[0].name})")
+            else:
+                lines.append("   ⚠ No buckets found (may be OK)")
+        except Exception as e:
+            lines.append(f"   ✗ Cannot list buckets: {e}")
+            issues.append(f"GCS access error: {e}")
+    except Exception as e:
+        lines.append(f"   ✗ StorageService failed: {e}")
+        issues.append(f"StorageService error: {e}")
+    return "5. Storage Service Test", lines, issues
+
+def probe_veo():
+    """Check that the Veo client can be created."""
+    lines, issues = [], []
+    try:
+        from vertex_ai_veo_client import VertexAIVeoClient
+        
+        project_id = os.getenv('GOOGLE_CLOUD_PROJECT')
+        location = os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1')
+        
+        if project_id:
+            client = VertexAIVeoClient(project_id, location)
+            lines.append("   ✓ Veo client created")
+            lines.append(f"   ✓ SDK version: {client.sdk_version}")
+        else:
+            lines.append("   ⚠ Cannot test without project ID")
+    except Exception as e:
+        lines.append(f"   ✗ Veo client failed: {e}")
+        issues.append(f"Veo client error: {e}")
+    return "6. Veo Client Setup Test", lines, issues
+
+def probe_database():
+    """Summarise the job queue database."""
+    lines, issues = [], []
+    try:
+        import sqlite3
+        db_path = "jobs.db"
+        if os.path.exists(db_path):
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM jobs")
+            count = cursor.fetchone()[0]
+            lines.append(f"   ✓ jobs.db exists with {count} jobs")
+            
+            cursor.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+            for status, cnt in cursor.fetchall():
+                lines.append(f"     - {status}: {cnt}")
+            
+            conn.close()
+        else:
+            lines.append("   ⚠ jobs.db not yet created (will be on first job)")
+    except Exception as e:
+        lines.append(f"   ✗ Database error: {e}")
+        issues.append(f"Database error: {e}")
+    return "7. Job Queue Database", lines, issues
+
+# Each probe returns (section title, output lines, issues)
+PROBES = (probe_storage, probe_veo, probe_database)
 
 def check_environment():
     print("=" * 60)
@@ -53,18 +132,24 @@ def check_environment():
         ('sqlite3', 'sqlite3')
     ]
     
+    # Locate packages and read their installed metadata without executing them
     for mod_name, pkg_name in packages:
+        if mod_name == 'sqlite3':
+            import sqlite3
+            print(f"   {pkg_name}: {sqlite3.sqlite_version}")
+            continue
         try:
-            if mod_name == 'sqlite3':
-                import sqlite3
-                print(f"   {pkg_name}: {sqlite3.sqlite_version}")
-            else:
-                mod = __import__(mod_name, fromlist=['__version__'])
-                version = getattr(mod, '__version__', 'unknown')
-                print(f"   {pkg_name}: {version}")
-        except ImportError as e:
-            print(f"   {pkg_name}: NOT INSTALLED ({e})")
+            spec = find_spec(mod_name)
+        except ImportError:
+            spec = None
+        if spec is None:
+            print(f"   {pkg_name}: NOT INSTALLED")
             issues.append(f"Missing package: {pkg_name}")
+            continue
+        try:
+            print(f"   {pkg_name}: {version(pkg_name)}")
+        except PackageNotFoundError:
+            print(f"   {pkg_name}: unknown")
     print()
     
     # Check environment variables
@@ -119,70 +204,16 @@ def check_environment():
                 issues.append("service_account.json not found - needed for Vertex AI")
     print()
     
-    # Test GCS access
-    print("5. Storage Service Test")
-    try:
-        from storage_service import StorageService
-        ss = StorageService()
-        print("   ✓ StorageService initialized")
-        
-        # Try to list buckets (read-only test)
-        try:
-            buckets = list(ss.client.list_buckets(max_results=1))
-            if buckets:
-                print(f"   ✓ Can access GCS (bucket: {buckets[0].name})")
-            else:
-                print("   ⚠ No buckets found (may be OK)")
-        except Exception as e:
-            print(f"   ✗ Cannot list buckets: {e}")
-            issues.append(f"GCS access error: {e}")
-    except Exception as e:
-        print(f"   ✗ StorageService failed: {e}")
-        issues.append(f"StorageService error: {e}")
-    print()
-    
-    # Test Veo client setup
-    print("6. Veo Client Setup Test")
-    try:
-        from vertex_ai_veo_client import VertexAIVeoClient
-        
-        project_id = os.getenv('GOOGLE_CLOUD_PROJECT')
-        location = os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1')
-        
-        if project_id:
-            client = VertexAIVeoClient(project_id, location)
-            print("   ✓ Veo client created")
-            print(f"   ✓ SDK version: {client.sdk_version}")
-        else:
-            print("   ⚠ Cannot test without project ID")
-    except Exception as e:
-        print(f"   ✗ Veo client failed: {e}")
-        issues.append(f"Veo client error: {e}")
-    print()
-    
-    # Check database
-    print("7. Job Queue Database")
-    try:
-        import sqlite3
-        db_path = "jobs.db"
-        if os.path.exists(db_path):
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM jobs")
-            count = cursor.fetchone()[0]
-            print(f"   ✓ jobs.db exists with {count} jobs")
-            
-            cursor.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
-            for status, cnt in cursor.fetchall():
-                print(f"     - {status}: {cnt}")
-            
-            conn.close()
-        else:
-            print("   ⚠ jobs.db not yet created (will be on first job)")
-    except Exception as e:
-        print(f"   ✗ Database error: {e}")
-        issues.append(f"Database error: {e}")
-    print()
+    # The service probes are independent and mostly wait on network or disk,
+    # so run them together and print their sections in order afterwards.
+    with ThreadPoolExecutor(max_workers=len(PROBES)) as executor:
+        results = list(executor.map(lambda probe: probe(), PROBES))
+    for title, lines, probe_issues in results:
+        print(title)
+        for line in lines:
+            print(line)
+        print()
+        issues.extend(probe_issues)
     
     # Summary
     print("=" * 60)
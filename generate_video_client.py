@@ -1,14 +1,162 @@
 import requests
-import base64
+import atexit
+import functools
+import json
+import random
 import time
 import os
+import uuid
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from video_client_interface import IVideoClient
+from storage_service import StorageService
+
+try:
+    # SIMD-accelerated codec with the same b64encode/b64decode API
+    import pybase64 as base64
+except ImportError:
+    import base64
 
 logger = logging.getLogger("vividflow")
 
+# Clients are built per job, so the keep-alive pool lives at module level and
+# every client reuses its connections to api.runpod.ai. Retries cover
+# idempotent requests only (status polls), never the job-submitting POST.
+RUNPOD_RETRY = Retry(total=5, backoff_factor=0.3, status_forcelist=(429, 502, 503, 504), raise_on_status=False)
+
+@functools.lru_cache(maxsize=1)
+def get_runpod_session():
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=RUNPOD_RETRY))
+    return session
+
+@atexit.register
+def close_runpod_session():
+    """Close pooled RunPod connections; the next get_runpod_session() builds a fresh session."""
+    if get_runpod_session.cache_info().currsize:
+        get_runpod_session().close()
+    get_runpod_session.cache_clear()
+
+# Image bytes encoded per step; a multiple of 3 so chunks encode without padding
+B64_READ_CHUNK = 3 * 64 * 1024
+# Encoded characters decoded per step; a multiple of 4 so each slice decodes alone
+B64_DECODE_CHUNK = 4 * 64 * 1024
+
+# Status polling schedule (seconds): fast polls for the first POLL_FAST_WINDOW,
+# then the interval grows by POLL_BACKOFF up to POLL_MAX_INTERVAL. It drops to
+# POLL_RUNNING_INTERVAL when the job starts, and request errors back off
+# separately up to POLL_MAX_ERROR_INTERVAL.
+POLL_INITIAL_INTERVAL = 0.5
+POLL_FAST_WINDOW = 10
+POLL_BACKOFF = 1.5
+POLL_MAX_INTERVAL = 15
+POLL_RUNNING_INTERVAL = 2.0
+POLL_MAX_ERROR_INTERVAL = 60
+POLL_JITTER = 0.25
+
+# Images processed concurrently by batch_process_images
+BATCH_CONCURRENCY = int(os.getenv("WAN_BATCH_CONCURRENCY", "4"))
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+
+# folder -> (st_mtime_ns, image filenames); adding, removing or renaming an
+# entry bumps the directory mtime and invalidates the listing
+_dir_listing_cache = {}
+
+def _list_images_cached(folder):
+    """Image filenames in folder, reused while the directory is unchanged."""
+    mtime_ns = os.stat(folder).st_mtime_ns
+    entry = _dir_listing_cache.get(folder)
+    if entry and entry[0] == mtime_ns:
+        return entry[1]
+    with os.scandir(folder) as entries:
+        files = tuple(e.name for e in entries if e.name.lower().endswith(IMAGE_EXTENSIONS) and e.is_file())
+    _dir_listing_cache[folder] = (mtime_ns, files)
+    return files
+
+# Upload input images to GCS and send a signed image_url instead of inline
+# base64. Only enable for RunPod workers that accept image_url.
+IMAGE_URL_UPLOAD = os.getenv("WAN_IMAGE_URL_UPLOAD", "false").lower() == "true"
+IMAGE_URL_EXPIRATION_MINUTES = 60
+
+def extract_video_base64(output):
+    """Return the base64 video from a RunPod output: a string, or a list/dict wrapping one."""
+    # Handle list output (sometimes RunPod returns a list)
+    if isinstance(output, list) and len(output) > 0:
+        output = output[0]
+    if isinstance(output, dict):
+        return output.get("video_base64") or output.get("video")
+    if isinstance(output, str):
+        return output
+    return None
+
+def decode_base64_to(video_base64, file_obj):
+    """Decode base64 (optionally a data URL) into file_obj a bounded slice at a time."""
+    # Skip a potential data URL prefix without copying the payload
+    start = video_base64.find("," if isinstance(video_base64, str) else b",") + 1
+    leftover = video_base64[:0]
+    for offset in range(start, len(video_base64), B64_DECODE_CHUNK):
+        # Drop line breaks/whitespace (e.g. MIME-wrapped output), then carry
+        # any partial 4-character quantum over to the next slice
+        chunk = leftover + video_base64[offset:offset + B64_DECODE_CHUNK]
+        chunk = chunk[:0].join(chunk.split())
+        usable = len(chunk) - len(chunk) % 4
+        file_obj.write(base64.b64decode(chunk[:usable]))
+        leftover = chunk[usable:]
+    if leftover:
+        # Truncated input: let b64decode report the padding error
+        file_obj.write(base64.b64decode(leftover))
+
+class Base64ImageBody:
+    """
+    Request body for a RunPod payload whose input.image_base64 is streamed:
+    the image is base64-encoded chunk by chunk while the body is sent, so
+    neither the raw file nor its full encoding is held in memory. len() lets
+    requests send an exact Content-Length instead of chunked encoding.
+    """
+    def __init__(self, payload, image_path):
+        # payload is {"input": {...}}; reopen the inner object to append the image
+        head = json.dumps(payload)
+        self._prefix = (head[:-2] + ', "image_base64": "').encode()
+        self._suffix = b'"}}'
+        self._image_path = image_path
+        encoded_size = 4 * -(-os.path.getsize(image_path) // 3)
+        self._length = len(self._prefix) + encoded_size + len(self._suffix)
+        self._chunks = None
+        self._pending = memoryview(b"")
+        self._offset = 0
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        yield self._prefix
+        with open(self._image_path, "rb") as image_file:
+            for chunk in iter(lambda: image_file.read(B64_READ_CHUNK), b""):
+                yield base64.b64encode(chunk)
+        yield self._suffix
+
+    def read(self, size=-1):
+        # Serve slices of the current encoded chunk; each byte is copied once
+        if self._chunks is None:
+            self._chunks = iter(self)
+        if size < 0:
+            rest = self._pending[self._offset:].tobytes()
+            self._pending, self._offset = memoryview(b""), 0
+            return rest + b"".join(self._chunks)
+        while self._offset >= len(self._pending):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return b""
+            self._pending, self._offset = memoryview(chunk), 0
+        data = self._pending[self._offset:self._offset + size].tobytes()
+        self._offset += len(data)
+        return data
+
 class WanVideoClient(IVideoClient):
-    def __init__(self, runpod_endpoint_id, runpod_api_key):
+    def __init__(self, runpod_endpoint_id, runpod_api_key, use_url_upload=IMAGE_URL_UPLOAD, storage_service=None):
         self.endpoint_id = runpod_endpoint_id
         self.api_key = runpod_api_key
         self.url = f"https://api.runpod.ai/v2/{self.endpoint_id}/run"
@@ -16,20 +164,15 @@ class WanVideoClient(IVideoClient):
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.session = get_runpod_session()
+        self.use_url_upload = use_url_upload
+        self._storage_service = storage_service
 
     def create_video_from_image(self, image_path, prompt, negative_prompt="", width=1280, height=720, length=121, steps=30, seed=42, cfg=3.0, **kwargs):
-        logger.info(f"Encoding image: {image_path}")
-        try:
-            with open(image_path, "rb") as image_file:
-                image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
-        except FileNotFoundError:
-            return {"status": "FAILED", "error": f"Image file not found: {image_path}"}
-
         payload = {
             "input": {
                 "prompt": prompt,
                 "negative_prompt": negative_prompt,
-                "image_base64": image_base64,
                 "width": width,
                 "height": height,
                 "num_frames": length,
@@ -39,11 +182,29 @@ class WanVideoClient(IVideoClient):
             }
         }
 
+        if self.use_url_upload:
+            if not os.path.exists(image_path):
+                return {"status": "FAILED", "error": f"Image file not found: {image_path}"}
+            logger.info(f"Uploading image: {image_path}")
+            try:
+                payload["input"]["image_url"] = self._upload_image(image_path)
+            except Exception as e:
+                logger.error(f"Image upload failed: {e}")
+                return {"status": "FAILED", "error": f"Image upload failed: {e}"}
+            body = json.dumps(payload)
+        else:
+            logger.info(f"Encoding image: {image_path}")
+            try:
+                # image_base64 is appended to the input object as the body streams
+                body = Base64ImageBody(payload, image_path)
+            except FileNotFoundError:
+                return {"status": "FAILED", "error": f"Image file not found: {image_path}"}
+
         logger.info(f"Sending request to RunPod: {self.url}")
         try:
             submission_time = time.time()
             # Increased timeout for video generation
-            response = requests.post(self.url, json=payload, headers=self.headers, timeout=600)
+            response = self.session.post(self.url, data=body, headers=self.headers, timeout=600)
             
             if response.status_code != 200:
                 logger.error(f"API Error: {response.status_code} - {response.text}")
@@ -84,26 +245,47 @@ class WanVideoClient(IVideoClient):
             logger.error(f"Exception in create_video_from_image: {e}")
             return {"status": "FAILED", "error": str(e)}
 
-    def _poll_job(self, job_id, submission_time, timeout=600, interval=5):
-        """Polls the status endpoint until completion or timeout."""
+    def _upload_image(self, image_path):
+        """Upload the input image and return a short-lived URL the worker can fetch."""
+        if self._storage_service is None:
+            self._storage_service = StorageService()
+        _, ext = os.path.splitext(image_path)
+        destination = f"inputs/{uuid.uuid4()}{ext.lower()}"
+        return self._storage_service.upload_file(image_path, destination, expiration_minutes=IMAGE_URL_EXPIRATION_MINUTES)
+
+    def _poll_job(self, job_id, submission_time, timeout=600):
+        """Polls the status endpoint until completion or timeout.
+
+        Polls quickly at first to catch short jobs, then backs off
+        geometrically while the job is queued; running jobs are polled at
+        POLL_RUNNING_INTERVAL. Request errors double a separate interval. Sleeps carry a little jitter.
+        """
         status_url = f"https://api.runpod.ai/v2/{self.endpoint_id}/status/{job_id}"
         
         start_time = None # Time when status became IN_PROGRESS
         polling_start = time.time()
+        interval = POLL_INITIAL_INTERVAL
+        error_interval = POLL_INITIAL_INTERVAL
         
         while time.time() - polling_start < timeout:
             try:
-                response = requests.get(status_url, headers=self.headers)
+                response = self.session.get(status_url, headers=self.headers)
                 if response.status_code != 200:
-                    logger.warning(f"Polling failed: {response.status_code}")
-                    time.sleep(interval)
+                    error_interval = min(error_interval * 2, POLL_MAX_ERROR_INTERVAL)
+                    logger.warning(f"Polling failed: {response.status_code}; retrying in {error_interval:.1f}s")
+                    time.sleep(error_interval)
                     continue
+                error_interval = POLL_INITIAL_INTERVAL
                 
                 data = response.json()
                 status = data.get("status")
                 
-                if status == "IN_PROGRESS" and start_time is None:
-                    start_time = time.time()
+                if status == "IN_PROGRESS":
+                    if start_time is None:
+                        start_time = time.time()
+                    interval = POLL_RUNNING_INTERVAL
+                elif status == "IN_QUEUE" and time.time() - polling_start > POLL_FAST_WINDOW:
+                    interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
                 
                 if status == "COMPLETED":
                     completion_time = time.time()
@@ -126,11 +308,12 @@ class WanVideoClient(IVideoClient):
                     return {"status": "FAILED", "error": data.get("error", "Unknown job error")}
                 
                 logger.info(f"Job {job_id} status: {status}...")
-                time.sleep(interval)
+                time.sleep(interval + random.uniform(0, POLL_JITTER * interval))
                 
             except Exception as e:
+                error_interval = min(error_interval * 2, POLL_MAX_ERROR_INTERVAL)
                 logger.error(f"Polling exception: {e}")
-                time.sleep(interval)
+                time.sleep(error_interval)
                 
         return {"status": "FAILED", "error": "Polling timed out"}
 
@@ -150,18 +333,7 @@ class WanVideoClient(IVideoClient):
             return False
 
         output_data = result.get("output")
-        
-        # Robustly handle different output formats
-        video_base64 = None
-        
-        # Handle list output (sometimes RunPod returns a list)
-        if isinstance(output_data, list) and len(output_data) > 0:
-            output_data = output_data[0]
-            
-        if isinstance(output_data, dict):
-            video_base64 = output_data.get("video_base64") or output_data.get("video")
-        elif isinstance(output_data, str):
-            video_base64 = output_data
+        video_base64 = extract_video_base64(output_data)
 
         if not video_base64:
              logger.error(f"Error: No video data found in output. Output type: {type(output_data)}")
@@ -169,38 +341,30 @@ class WanVideoClient(IVideoClient):
 
         logger.info(f"Saving video to {output_path}...")
         try:
-            # Strip potential data URL prefix
-            if isinstance(video_base64, str) and "," in video_base64:
-                video_base64 = video_base64.split(",")[1]
-                
-            video_bytes = base64.b64decode(video_base64)
             with open(output_path, "wb") as f:
-                f.write(video_bytes)
+                decode_base64_to(video_base64, f)
             logger.info("Video saved successfully.")
             return True
         except Exception as e:
             logger.error(f"Failed to save video: {e}")
+            if os.path.exists(output_path):
+                os.remove(output_path)
             return False
 
-    def batch_process_images(self, image_folder_path, output_folder_path, prompt, negative_prompt="", width=1280, height=720, length=121, steps=30, seed=42, cfg=3.0):
-        if not os.path.exists(output_folder_path):
-            os.makedirs(output_folder_path)
-            logger.info(f"Created output directory: {output_folder_path}")
+    def batch_process_images(self, image_folder_path, output_folder_path, prompt, negative_prompt="", width=1280, height=720, length=121, steps=30, seed=42, cfg=3.0, max_workers=None):
+        os.makedirs(output_folder_path, exist_ok=True)
 
-        image_extensions = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
         try:
-            files = [f for f in os.listdir(image_folder_path) if f.lower().endswith(image_extensions)]
+            files = _list_images_cached(image_folder_path)
         except FileNotFoundError:
             logger.error(f"Error: Input directory '{image_folder_path}' not found.")
             return {"successful": 0, "total_files": 0, "results": []}
 
         total_files = len(files)
-        successful = 0
-        results = []
-
         logger.info(f"Found {total_files} images to process in {image_folder_path}")
 
-        for i, filename in enumerate(files, 1):
+        def process(indexed_filename):
+            i, filename = indexed_filename
             logger.info(f"[{i}/{total_files}] Processing {filename}...")
             image_path = os.path.join(image_folder_path, filename)
             output_filename = os.path.splitext(filename)[0] + ".mp4"
@@ -221,14 +385,18 @@ class WanVideoClient(IVideoClient):
             if result.get("status") == "COMPLETED":
                 if self.save_video_result(result, output_path):
                     logger.info(f"Successfully processed and saved: {output_filename}")
-                    successful += 1
-                    results.append({"file": filename, "status": "SUCCESS", "output": output_path})
-                else:
-                    logger.error(f"Failed to save video for: {filename}")
-                    results.append({"file": filename, "status": "SAVE_FAILED"})
-            else:
-                logger.error(f"Failed to process {filename}: {result.get('error')}")
-                results.append({"file": filename, "status": "FAILED", "error": result.get("error")})
+                    return {"file": filename, "status": "SUCCESS", "output": output_path}
+                logger.error(f"Failed to save video for: {filename}")
+                return {"file": filename, "status": "SAVE_FAILED"}
+            logger.error(f"Failed to process {filename}: {result.get('error')}")
+            return {"file": filename, "status": "FAILED", "error": result.get("error")}
+
+        # Each job spends minutes waiting on RunPod, so keep several in flight;
+        # map() returns results in file order.
+        max_workers = max_workers or BATCH_CONCURRENCY
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(process, enumerate(files, 1)))
+        successful = sum(1 for r in results if r["status"] == "SUCCESS")
 
         return {
             "total_files": total_files,
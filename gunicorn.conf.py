@@ -0,0 +1,21 @@
+"""Gunicorn settings, loaded automatically from the working directory."""
+import os
+
+bind = f":{os.getenv('PORT', '8080')}"
+
+# One worker: the job queue worker thread and SQLite database live in-process.
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+
+# Blocking socket reads (Supabase auth lookups, GCS) release the GIL, so
+# request concurrency scales with threads. Keep this at or below the
+# Supabase pool size (SUPABASE_HTTP_LIMITS) so threads never queue for a
+# connection.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+
+# No worker timeout: Veo operations are long-running
+timeout = 0
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
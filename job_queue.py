@@ -1,11 +1,13 @@
 """
 Job Queue System with Concurrency Management
 """
-import json
+import orjson
 import uuid
+import base64
 import threading
 import time
 import logging
+import tempfile
 from datetime import datetime
 from enum import Enum
 from typing import Dict, Optional, Any
@@ -13,12 +15,16 @@ import sqlite3
 from dataclasses import dataclass, asdict, field
 from google.cloud import storage
 from video_client_factory import VideoClientFactory
+from generate_video_client import extract_video_base64, decode_base64_to
 from storage_service import StorageService
 from concurrency_manager import ConcurrencyManager
 import os
 
 logger = logging.getLogger("vividflow")
 
+# Decoded videos stay in memory up to this size before spooling to disk
+VIDEO_SPOOL_MAX_SIZE = 64 << 20
+
 class JobStatus(Enum):
     QUEUED = "queued"
     PROCESSING = "processing"
@@ -76,8 +82,18 @@ class JobQueue:
                     cls._instance = cls(db_path)
         return cls._instance
     
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        # Skips the per-commit fsync to keep add_job cheap on the request
+        # thread. In WAL mode this survives an app crash, but a power loss or
+        # OS crash can drop the most recently committed jobs.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
+            # Readers (status polling) no longer block the worker's writes
+            conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS jobs (
                     job_id TEXT PRIMARY KEY,
@@ -96,12 +112,15 @@ class JobQueue:
                     metrics TEXT
                 )
             """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user_id, created_at DESC)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
             conn.commit()
     
     def _save_job(self, job: Job):
-        with sqlite3.connect(self.db_path) as conn:
-            parameters_json = json.dumps(job.parameters) if job.parameters else None
-            metrics_json = json.dumps(job.metrics) if job.metrics else None
+        with self._connect() as conn:
+            # Decoded so the columns stay TEXT, as rows written by json.dumps were
+            parameters_json = orjson.dumps(job.parameters).decode() if job.parameters else None
+            metrics_json = orjson.dumps(job.metrics).decode() if job.metrics else None
             conn.execute("""
                 INSERT OR REPLACE INTO jobs 
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -115,25 +134,50 @@ class JobQueue:
             conn.commit()
     
     def _load_job(self, job_id: str) -> Optional[Job]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.row_factory = sqlite3.Row
             row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
-            if not row: return None
-            parameters = json.loads(row["parameters"]) if row["parameters"] else None
-            metrics = json.loads(row["metrics"]) if row["metrics"] else None
-            return Job(
-                job_id=row["job_id"], user_id=row["user_id"], model=row["model"],
-                status=JobStatus(row["status"]),
-                created_at=datetime.fromisoformat(row["created_at"]),
-                updated_at=datetime.fromisoformat(row["updated_at"]),
-                input_image_url=row["input_image_url"], input_image_path=row["input_image_path"],
-                prompt=row["prompt"], negative_prompt=row["negative_prompt"],
-                parameters=parameters, result_url=row["result_url"],
-                error_message=row["error_message"], metrics=metrics
-            )
+        return self._row_to_job(row) if row else None
+    
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Job:
+        parameters = orjson.loads(row["parameters"]) if row["parameters"] else None
+        metrics = orjson.loads(row["metrics"]) if row["metrics"] else None
+        return Job(
+            job_id=row["job_id"], user_id=row["user_id"], model=row["model"],
+            status=JobStatus(row["status"]),
+            created_at=datetime.fromisoformat(row["created_at"]),
+            updated_at=datetime.fromisoformat(row["updated_at"]),
+            input_image_url=row["input_image_url"], input_image_path=row["input_image_path"],
+            prompt=row["prompt"], negative_prompt=row["negative_prompt"],
+            parameters=parameters, result_url=row["result_url"],
+            error_message=row["error_message"], metrics=metrics
+        )
+    
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        """Same shape as Job.to_dict(), built straight from a jobs row.
+        Timestamps are already stored as ISO strings, so no parsing is needed."""
+        return {
+            "job_id": row["job_id"],
+            "user_id": row["user_id"],
+            "model": row["model"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "result_url": row["result_url"],
+            "error_message": row["error_message"],
+            "metrics": orjson.loads(row["metrics"]) if row["metrics"] else None,
+            "prompt": row["prompt"]
+        }
     
+    @staticmethod
+    def _new_job_id() -> str:
+        # 128 random bits as 26 lowercase base32 chars (vs 36 for a dashed UUID)
+        return base64.b32encode(uuid.uuid4().bytes).rstrip(b'=').decode('ascii').lower()
+
     def add_job(self, job_data: Dict[str, Any]) -> str:
-        job_id = str(uuid.uuid4())
+        job_id = self._new_job_id()
         job = Job(
             job_id=job_id, user_id=job_data["user_id"], model=job_data["model"],
             status=JobStatus.QUEUED, created_at=datetime.now(), updated_at=datetime.now(),
@@ -209,6 +253,8 @@ class JobQueue:
                 video_data = result.get("output")
                 if video_data:
                     gcs_url = self._upload_video_to_gcs(job.job_id, video_data, job.model)
+                    if not gcs_url:
+                        raise Exception("Video upload failed")
                     job.result_url = gcs_url
                     job.status = JobStatus.COMPLETED
                     job.metrics = {"generation_time": gen_time}
@@ -229,7 +275,10 @@ class JobQueue:
         finally:
             # 4. Cleanup
             if acquired:
-                concurrency.release(job.user_id, job.job_id)
+                try:
+                    concurrency.release(job.user_id, job.job_id)
+                except Exception as e:
+                    logger.error(f"Failed to release slot for job {job.job_id}: {e}")
             
             job.updated_at = datetime.now()
             self._save_job(job)
@@ -240,7 +289,7 @@ class JobQueue:
         while not self.stop_flag:
             try:
                 # Find next QUEUED job
-                with sqlite3.connect(self.db_path) as conn:
+                with self._connect() as conn:
                     conn.row_factory = sqlite3.Row
                     row = conn.execute(
                         "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
@@ -248,9 +297,8 @@ class JobQueue:
                     ).fetchone()
                 
                 if row:
-                    job = self._load_job(row["job_id"])
-                    if job:
-                        self._process_job(job)
+                    # The row is already the full job; no second lookup by id
+                    self._process_job(self._row_to_job(row))
                 else:
                     time.sleep(2)
             except Exception as e:
@@ -269,14 +317,29 @@ class JobQueue:
             self.worker_thread.join(timeout=5)
     
     def get_user_jobs(self, user_id: str, limit: int = 10) -> list:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.row_factory = sqlite3.Row
             rows = conn.execute(
                 "SELECT * FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
                 (user_id, limit)
             ).fetchall()
         
-        return [self._load_job(row["job_id"]).to_dict() for row in rows if self._load_job(row["job_id"])]
+        return [self._row_to_dict(row) for row in rows]
+    
+    def get_user_usage(self, user_id: str, since: datetime) -> Dict[str, Any]:
+        """Count a user's jobs per status, overall and since the given time, in one query."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*), SUM(created_at > ?) FROM jobs WHERE user_id = ? GROUP BY status",
+                (since.isoformat(), user_id)
+            ).fetchall()
+        by_status = {status.value: 0 for status in JobStatus}
+        total = recent = 0
+        for status, count, recent_count in rows:
+            by_status[status] = count
+            total += count
+            recent += recent_count
+        return {"total": total, "recent": recent, "by_status": by_status}
     
     def _download_from_gcs(self, gcs_url: str) -> Optional[str]:
         try:
@@ -294,7 +357,6 @@ class JobQueue:
             bucket = storage_client.bucket(bucket_name)
             blob = bucket.blob(blob_name)
             
-            import tempfile
             filename = f"{uuid.uuid4()}_{os.path.basename(blob_name)}"
             image_path = os.path.join(tempfile.gettempdir(), filename)
             blob.download_to_filename(image_path)
@@ -303,41 +365,46 @@ class JobQueue:
             logger.error(f"GCS download failed: {e}")
             return None
     
-    def _upload_video_to_gcs(self, job_id: str, video_data: bytes, model: str) -> str:
+    def _upload_video_to_gcs(self, job_id: str, video_data: Any, model: str) -> str:
         try:
             storage_service = StorageService()
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"jobs/{job_id}_{model}_{timestamp}.mp4"
-            
-            import tempfile
-            temp_path = os.path.join(tempfile.gettempdir(), f"temp_{job_id}.mp4")
-            with open(temp_path, "wb") as f:
-                f.write(video_data)
-            
-            gcs_url = storage_service.upload_file(temp_path, filename)
-            os.remove(temp_path)
-            return gcs_url
+            if isinstance(video_data, (bytes, bytearray)):
+                # Veo returns raw bytes; upload straight from memory
+                return storage_service.upload_bytes(video_data, filename)
+
+            # RunPod returns base64 (possibly wrapped in a list/dict); decode it
+            # in slices, spilling to disk past VIDEO_SPOOL_MAX_SIZE
+            video_base64 = extract_video_base64(video_data)
+            if not video_base64:
+                logger.error(f"No video found in output of type {type(video_data).__name__}")
+                return ""
+            with tempfile.SpooledTemporaryFile(max_size=VIDEO_SPOOL_MAX_SIZE) as spool:
+                decode_base64_to(video_base64, spool)
+                return storage_service.upload_stream(spool, filename)
         except Exception as e:
             logger.error(f"GCS upload failed: {e}")
             return ""
     
     def get_all_jobs(self) -> list:
         """Get all jobs for admin dashboard."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.row_factory = sqlite3.Row
             rows = conn.execute(
                 "SELECT * FROM jobs ORDER BY created_at DESC LIMIT 100"
             ).fetchall()
         
-        return [self._load_job(row["job_id"]).to_dict() for row in rows if self._load_job(row["job_id"])]
+        return [self._row_to_dict(row) for row in rows]
     
     def get_queue_stats(self) -> dict:
         """Get queue statistics."""
-        jobs = self.get_all_jobs()
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
         return {
-            "total": len(jobs),
-            "queued": len([j for j in jobs if j['status'] == 'queued']),
-            "processing": len([j for j in jobs if j['status'] == 'processing']),
-            "completed": len([j for j in jobs if j['status'] == 'completed']),
-            "failed": len([j for j in jobs if j['status'] == 'failed'])
+            "total": sum(counts.values()),
+            "queued": counts.get(JobStatus.QUEUED.value, 0),
+            "processing": counts.get(JobStatus.PROCESSING.value, 0),
+            "completed": counts.get(JobStatus.COMPLETED.value, 0),
+            "failed": counts.get(JobStatus.FAILED.value, 0)
         }
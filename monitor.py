@@ -202,13 +202,10 @@ def get_queue_stats():
     """Get detailed queue statistics."""
     queue = JobQueue.get_instance()
     with sqlite3.connect(queue.db_path) as conn:
-        # Overall stats
-        cursor = conn.execute("SELECT COUNT(*) FROM jobs")
-        total_jobs = cursor.fetchone()[0]
-        
-        # Status breakdown
+        # Status breakdown; the overall total is derived from it
         cursor = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
         status_breakdown = dict(cursor.fetchall())
+        total_jobs = sum(status_breakdown.values())
         
         # Average processing time for completed jobs
         cursor = conn.execute("""
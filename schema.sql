@@ -33,6 +33,12 @@ CREATE TABLE public.history (
 );
 ALTER TABLE public.history ENABLE ROW LEVEL SECURITY;
 
+-- Indexes for the hot lookups: API key auth and per-user history listing
+CREATE UNIQUE INDEX IF NOT EXISTS idx_profiles_api_key
+  ON public.profiles (api_key) WHERE api_key IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_history_user_created
+  ON public.history (user_id, created_at DESC, id DESC);
+
 -- 4. Create Policies (Rules) for the Tables
 -- Profiles Policies
 CREATE POLICY "Enable read access for users based on user_id" ON public.profiles FOR SELECT USING (auth.uid() = id);
@@ -11,18 +11,32 @@ class StorageService:
         self.client = storage.Client()
         self.bucket = self.client.bucket(self.bucket_name)
 
-    def upload_file(self, source_file_name, destination_blob_name):
+    def upload_file(self, source_file_name, destination_blob_name, expiration_minutes=60):
         """Uploads a file to the bucket and returns a URL (signed if possible, else public)."""
         blob = self.bucket.blob(destination_blob_name)
         
         blob.upload_from_filename(source_file_name)
-        
+        return self._blob_url(blob, destination_blob_name, expiration_minutes)
+
+    def upload_bytes(self, data, destination_blob_name, content_type="video/mp4"):
+        """Uploads in-memory data to the bucket and returns a URL (signed if possible, else public)."""
+        blob = self.bucket.blob(destination_blob_name)
+        blob.upload_from_string(data, content_type=content_type)
+        return self._blob_url(blob, destination_blob_name)
+
+    def upload_stream(self, file_obj, destination_blob_name, content_type="video/mp4"):
+        """Uploads a file-like object from its start and returns a URL (signed if possible, else public)."""
+        blob = self.bucket.blob(destination_blob_name)
+        blob.upload_from_file(file_obj, rewind=True, content_type=content_type)
+        return self._blob_url(blob, destination_blob_name)
+
+    def _blob_url(self, blob, destination_blob_name, expiration_minutes=60):
         # Try to generate a signed URL
         try:
             import datetime
             url = blob.generate_signed_url(
                 version="v4",
-                expiration=datetime.timedelta(minutes=60),
+                expiration=datetime.timedelta(minutes=expiration_minutes),
                 method="GET"
             )
             return url
@@ -0,0 +1,320 @@
+"""
+Tests for the v1 API router
+"""
+import io
+import logging
+import os
+import pytest
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+from web_app import app
+from api_router import api_limiter, _usage_cache, _history_cache
+from job_queue import Job, JobStatus
+
+USER = {"id": "user-1", "email": "user@example.com", "is_approved": True}
+HEADERS = {"X-API-Key": "vivid-api-key-test"}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('api_router.TEMP_UPLOAD_DIR', str(tmp_path))
+    app.config['TESTING'] = True
+    api_limiter.reset()
+    _usage_cache.clear()
+    _history_cache.clear()
+    with patch('api_router.AuthService.get_user_by_api_key', return_value=USER), \
+         patch('api_router.JobQueue.get_instance') as mock_queue:
+        mock_queue.return_value.add_job.return_value = "job-1"
+        with app.test_client() as client:
+            client.queue = mock_queue.return_value
+            yield client
+
+def _image(name="test.png", size=16):
+    return (io.BytesIO(b"\0" * size), name)
+
+def test_missing_api_key(client):
+    response = client.post('/api/v1/generate', data={'prompt': 'a cat'})
+    assert response.status_code == 401
+
+def test_cors_preflight_skips_auth(client):
+    response = client.options('/api/v1/generate', headers={
+        "Origin": "https://example.com",
+        "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "X-API-Key",
+    })
+    assert response.status_code == 200
+
+def test_malformed_api_key_skips_lookup(client):
+    with patch('api_router.AuthService.get_user_by_api_key') as lookup:
+        response = client.get('/api/v1/usage', headers={"X-API-Key": "not-a-key"})
+        assert response.status_code == 401
+        response = client.get('/api/v1/usage', headers={"X-API-Key": "vivid-api-key-" + "x" * 1000})
+        assert response.status_code == 401
+    lookup.assert_not_called()
+
+def test_generate_wan_defaults(client):
+    response = client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'image': _image()
+    })
+    assert response.status_code == 202
+    assert response.get_json()["job_id"] == "job-1"
+    job_data = client.queue.add_job.call_args[0][0]
+    assert job_data["parameters"]["cfg"] == 7.5
+    assert job_data["parameters"]["steps"] == 30
+
+def test_default_parameters_are_fresh_copies():
+    from api_router import PARAMETER_PARSERS
+    parse = PARAMETER_PARSERS["veo3.1"]
+    first = parse({})
+    first["duration_seconds"] = 99
+    assert parse({})["duration_seconds"] == 4
+    assert parse({"duration_seconds": "8"})["resolution"] == "720p"
+
+def test_generate_veo_parameters(client):
+    response = client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'model': 'veo3.1', 'enhance_prompt': 'true',
+        'image_url': 'gs://bucket/cat.png'
+    })
+    assert response.status_code == 202
+    params = client.queue.add_job.call_args[0][0]["parameters"]
+    assert params["enhance_prompt"] is True
+    assert params["duration_seconds"] == 4
+
+@pytest.mark.parametrize("name", ["cat.gif", "png", "cat.png.exe"])
+def test_generate_rejects_bad_extension(client, name):
+    response = client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'image': _image(name)
+    })
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid type"
+
+def test_generate_accepts_uppercase_extension(client):
+    response = client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'image': _image("CAT.JPEG")
+    })
+    assert response.status_code == 202
+
+def test_generate_rejects_unknown_model(client):
+    response = client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'model': 'sora', 'image_url': 'gs://bucket/cat.png'
+    })
+    assert response.status_code == 400
+
+def test_generate_rejects_large_file(client):
+    with patch('api_router.MAX_UPLOAD_BYTES', 8):
+        response = client.post('/api/v1/generate', headers=HEADERS, data={
+            'prompt': 'a cat walking', 'image': _image(size=64)
+        })
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Too large"
+
+def test_generate_saves_upload(client, tmp_path):
+    client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'image': (io.BytesIO(b"png-bytes"), "cat.png")
+    })
+    image_path = client.queue.add_job.call_args[0][0]["input_image_path"]
+    assert os.path.dirname(image_path) == str(tmp_path)
+    with open(image_path, 'rb') as f:
+        assert f.read() == b"png-bytes"
+
+def test_generate_sanitizes_upload_name(client, tmp_path):
+    client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'image': (io.BytesIO(b"png-bytes"), "../../etc/cat.png")
+    })
+    image_path = client.queue.add_job.call_args[0][0]["input_image_path"]
+    assert os.path.dirname(image_path) == str(tmp_path)
+    assert image_path.endswith("_etc_cat.png")
+
+def test_usage(client):
+    client.queue.get_user_usage.return_value = {
+        "total": 12, "recent": 5,
+        "by_status": {"completed": 9, "failed": 2, "queued": 1},
+    }
+    response = client.get('/api/v1/usage', headers=HEADERS)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["total_jobs"] == 12
+    assert body["completed"] == 9
+    assert body["failed"] == 2
+    assert body["queued"] == 1
+    assert body["recent_24h"] == 5
+    assert body["credits_remaining"] == 495
+
+def test_usage_is_cached_per_user(client):
+    client.queue.get_user_usage.return_value = {"total": 1, "recent": 1, "by_status": {}}
+    for _ in range(3):
+        assert client.get('/api/v1/usage', headers=HEADERS).status_code == 200
+    client.queue.get_user_usage.assert_called_once()
+
+def test_history_cached_until_new_job(client):
+    client.queue.get_user_jobs.return_value = [{"job_id": "job-0"}]
+    for _ in range(2):
+        client.get('/api/v1/history?limit=5', headers=HEADERS)
+    client.get('/api/v1/history?limit=10', headers=HEADERS)
+    assert client.queue.get_user_jobs.call_count == 2
+
+    client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'image_url': 'gs://bucket/cat.png'
+    })
+    client.get('/api/v1/history?limit=5', headers=HEADERS)
+    assert client.queue.get_user_jobs.call_count == 3
+
+@pytest.mark.parametrize("raw, limit", [("abc", 20), ("-1", 1), ("0", 1), ("5000", 100)])
+def test_history_limit_is_parsed_and_clamped(client, raw, limit):
+    client.queue.get_user_jobs.return_value = []
+    response = client.get(f'/api/v1/history?limit={raw}', headers=HEADERS)
+    assert response.status_code == 200
+    client.queue.get_user_jobs.assert_called_once_with("user-1", limit)
+
+def test_generate_rate_limited_per_user(client):
+    with patch('api_router.GENERATE_USER_LIMIT', "2 per hour"):
+        codes = [client.post('/api/v1/generate', headers=HEADERS, data={
+            'prompt': 'a cat walking', 'image_url': 'gs://bucket/cat.png'
+        }).status_code for _ in range(3)]
+    assert codes == [202, 202, 429]
+
+def test_status_uses_its_own_per_user_limit(client):
+    client.queue.get_job.return_value = _job()
+    with patch('api_router.STATUS_USER_LIMIT', "2 per hour"), \
+         patch('api_router.GENERATE_USER_LIMIT', "1 per hour"):
+        assert client.post('/api/v1/generate', headers=HEADERS, data={
+            'prompt': 'a cat walking', 'image_url': 'gs://bucket/cat.png'
+        }).status_code == 202
+        codes = [client.get('/api/v1/status/job-1', headers=HEADERS).status_code for _ in range(3)]
+    assert codes == [200, 200, 429]
+
+def test_generate_rejects_large_body_before_parsing(client):
+    with patch('api_router.MAX_REQUEST_BYTES', 32), \
+         patch('api_router.validate_image_source') as validate:
+        response = client.post('/api/v1/generate', headers=HEADERS, data={
+            'prompt': 'a cat walking', 'image': _image(size=64)
+        })
+    assert response.status_code == 413
+    assert response.get_json()["error"] == "Request too large"
+    validate.assert_not_called()
+
+def test_cancel_job(client):
+    client.queue.get_job.return_value = MagicMock(user_id="user-1", status=None)
+    client.queue.cancel_job.return_value = True
+    response = client.post('/api/v1/cancel/job-1', headers=HEADERS)
+    assert response.status_code == 200
+    client.queue.cancel_job.assert_called_once_with("job-1")
+
+@pytest.mark.parametrize("field", [
+    {'steps': '0'},
+    {'steps': '101'},
+    {'cfg': '25'},
+    {'model': 'veo3.1', 'duration_seconds': '30'},
+    {'model': 'veo3.1', 'resolution': '4k'},
+    {'model': 'veo3.1', 'aspect_ratio': '1:1'},
+])
+def test_generate_rejects_out_of_range_parameter(client, field):
+    response = client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'image_url': 'gs://bucket/cat.png', **field
+    })
+    assert response.status_code == 400
+    assert response.get_json()["error"][0].startswith("Invalid parameter")
+    client.queue.add_job.assert_not_called()
+
+@pytest.mark.parametrize("value", ["high", "nan", "inf", "-Infinity"])
+def test_generate_rejects_non_numeric_parameter(client, value):
+    response = client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'cfg': value, 'image_url': 'gs://bucket/cat.png'
+    })
+    assert response.status_code == 400
+    client.queue.add_job.assert_not_called()
+
+@pytest.mark.parametrize("url, status", [
+    ("gs://bucket/cat.png", 202),
+    ("HTTPS://example.com/cat.png", 202),
+    ("httpfoo://example.com/cat.png", 400),
+    ("ftp://example.com/cat.png", 400),
+])
+def test_generate_image_url_schemes(client, url, status):
+    response = client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': 'a cat walking', 'image_url': url
+    })
+    assert response.status_code == status
+
+def test_generate_rejects_short_prompt(client):
+    response = client.post('/api/v1/generate', headers=HEADERS, data={
+        'prompt': '  ab  ', 'image_url': 'gs://bucket/cat.png'
+    })
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid prompt"
+
+def test_validation_failure_logs_once(client, caplog):
+    with caplog.at_level(logging.WARNING, logger="vividflow"):
+        client.post('/api/v1/generate', headers=HEADERS, data={
+            'prompt': 'a cat walking', 'image_url': 'ftp://example.com/cat.png'
+        })
+    warnings = [r.getMessage() for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert "code=invalid_url" in warnings[0]
+
+def test_body_cap_applies_to_api_only(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 'test_user'
+    with patch('api_router.MAX_REQUEST_BYTES', 32), \
+         patch('web_app.PromptEnhancer') as enhancer, \
+         patch.dict('os.environ', {'GROQ_API_KEY': 'test_key'}):
+        enhancer.return_value.enhance.return_value = "Enhanced prompt"
+        response = client.post('/enhance_prompt', data={'prompt': 'a cat walking ' * 10})
+    assert response.status_code == 200
+
+def _job(status=JobStatus.QUEUED, user_id="user-1"):
+    return Job(job_id="job-1", user_id=user_id, model="wan2.1", status=status,
+               created_at=datetime(2025, 1, 1), updated_at=datetime(2025, 1, 1), prompt="a cat")
+
+def test_status_and_history(client):
+    client.queue.get_job.return_value = _job()
+    response = client.get('/api/v1/status/job-1', headers=HEADERS)
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "queued"
+    assert response.headers["ETag"]
+    assert "max-age" not in response.headers.get("Cache-Control", "")
+
+    client.queue.get_user_jobs.return_value = [{"job_id": "job-1"}]
+    response = client.get('/api/v1/history?limit=5', headers=HEADERS)
+    assert response.get_json()["jobs"] == [{"job_id": "job-1"}]
+    client.queue.get_user_jobs.assert_called_once_with("user-1", 5)
+
+def test_status_etag_revalidation(client):
+    client.queue.get_job.return_value = _job(JobStatus.COMPLETED)
+    first = client.get('/api/v1/status/job-1', headers=HEADERS)
+    assert first.status_code == 200
+    assert "max-age=300" in first.headers["Cache-Control"]
+
+    again = client.get('/api/v1/status/job-1', headers={**HEADERS, "If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+
+    client.queue.get_job.return_value.updated_at = datetime(2025, 1, 2)
+    changed = client.get('/api/v1/status/job-1', headers={**HEADERS, "If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+
+def test_json_provider_matches_flask_default():
+    from datetime import datetime
+    from flask.json.provider import DefaultJSONProvider
+    payload = {"b": 1, "a": [datetime(2025, 1, 2, 3, 4, 5)]}
+    assert app.json.loads(app.json.dumps(payload)) == \
+        DefaultJSONProvider(app).loads(DefaultJSONProvider(app).dumps(payload))
+    assert app.json.dumps({"b": 1, "a": 2}) == '{"a":2,"b":1}'
+
+def test_admin_key_check(client):
+    with patch('api_router.ADMIN_API_KEY', b"admin-secret"):
+        assert client.get('/api/v1/admin/pending').status_code == 403
+        assert client.get('/api/v1/admin/pending', headers={"X-Admin-Key": "wrong"}).status_code == 403
+        with patch('api_router.AuthService.list_pending_users', return_value=[]):
+            response = client.get('/api/v1/admin/pending', headers={"X-Admin-Key": "admin-secret"})
+        assert response.status_code == 200
+    with patch('api_router.ADMIN_API_KEY', b""):
+        assert client.get('/api/v1/admin/pending', headers={"X-Admin-Key": ""}).status_code == 403
+
+def test_api_key_never_logged(client, caplog):
+    client.queue.get_user_usage.return_value = {"total": 0, "recent": 0, "by_status": {}}
+    with caplog.at_level(logging.DEBUG, logger="vividflow"):
+        client.get('/api/v1/usage', headers=HEADERS)
+    assert "Headers:" in caplog.text
+    assert HEADERS["X-API-Key"] not in caplog.text
@@ -165,3 +165,162 @@ def test_user_logout(auth_service):
         assert result is True
         mock_sign_out.assert_called_once()
 
+
+# --- Profile cache ---
+
+@pytest.fixture
+def admin_client():
+    import auth_service
+    caches = (auth_service._api_key_cache, auth_service._user_id_cache, auth_service._unknown_api_key_cache)
+    for cache in caches:
+        cache.clear()
+    client = MagicMock()
+    with patch('auth_service.get_supabase_admin', return_value=client):
+        yield client
+    for cache in caches:
+        cache.clear()
+
+def test_get_user_by_api_key_is_cached(admin_client):
+    profile = {"id": "user-1", "api_key": "key-1", "is_approved": True}
+    query = admin_client.table.return_value.select.return_value.eq.return_value.maybe_single.return_value
+    query.execute.return_value = MagicMock(data=profile)
+
+    assert AuthService.get_user_by_api_key("key-1") == profile
+    assert AuthService.get_user_by_api_key("key-1") == profile
+    assert query.execute.call_count == 1
+
+def test_generate_api_key_invalidates_old_key(admin_client):
+    old_profile = {"id": "user-1", "api_key": "key-1", "is_approved": True}
+    query = admin_client.table.return_value.select.return_value.eq.return_value.maybe_single.return_value
+    query.execute.return_value = MagicMock(data=old_profile)
+    AuthService.get_user_by_api_key("key-1")
+
+    upsert = admin_client.table.return_value.upsert.return_value
+    upsert.execute.return_value = MagicMock(data=[{**old_profile, "api_key": "vivid-api-key-fixed"}])
+    with patch('auth_service.secrets.token_urlsafe', return_value="fixed"):
+        new_key = AuthService.generate_api_key("user-1")
+
+    assert new_key == "vivid-api-key-fixed"
+    import auth_service
+    assert all("api_key" not in cached for cached in auth_service._api_key_cache.values())
+    query.execute.return_value = None
+    assert AuthService.get_user_by_api_key("key-1") is None
+    assert AuthService.get_user_by_api_key(new_key)["id"] == "user-1"
+
+def test_unknown_api_key_is_briefly_remembered(admin_client):
+    query = admin_client.table.return_value.select.return_value.eq.return_value.maybe_single.return_value
+    query.execute.return_value = None
+    assert AuthService.get_user_by_api_key("key-unknown") is None
+    assert AuthService.get_user_by_api_key("key-unknown") is None
+    assert query.execute.call_count == 1
+
+    # Lookup failures are not remembered
+    query.execute.side_effect = Exception("connection reset")
+    assert AuthService.get_user_by_api_key("key-flaky") is None
+    query.execute.side_effect = None
+    query.execute.return_value = MagicMock(data={"id": "user-2", "is_approved": True})
+    assert AuthService.get_user_by_api_key("key-flaky")["id"] == "user-2"
+
+def test_add_history_is_batched(admin_client):
+    import auth_service
+    with patch('auth_service._ensure_history_writer'):
+        assert AuthService.add_history("user-1", {"prompt": "a", "timestamp": "x"}) is True
+        assert AuthService.add_history("user-1", {"prompt": "b"}) is True
+    admin_client.table.return_value.insert.assert_not_called()
+
+    auth_service.flush_history()
+    admin_client.table.return_value.insert.assert_called_once_with(
+        [{"prompt": "a", "user_id": "user-1"}, {"prompt": "b", "user_id": "user-1"}]
+    )
+
+def test_approve_users_single_update(admin_client):
+    update = admin_client.table.return_value.update.return_value.in_.return_value
+    update.execute.return_value = MagicMock(data=[{"id": "user-1"}, {"id": "user-2"}])
+
+    assert AuthService.approve_users(["user-1", "user-2"]) == 2
+    admin_client.table.return_value.update.return_value.in_.assert_called_once_with('id', ["user-1", "user-2"])
+    assert AuthService.approve_users([]) == 0
+
+def test_get_user_by_id_missing_profile(admin_client):
+    query = admin_client.table.return_value.select.return_value.eq.return_value.maybe_single.return_value
+    query.execute.return_value = None
+    assert AuthService.get_user_by_id("missing") is None
+
+def test_close_supabase_rebuilds_clients(monkeypatch):
+    import auth_service
+    monkeypatch.setenv("SUPABASE_URL", "https://example.supabase.co")
+    monkeypatch.setenv("SUPABASE_KEY", "anon-key")
+    auth_service.close_supabase()
+    try:
+        with patch('auth_service.create_client', side_effect=lambda *a, **k: MagicMock()) as create:
+            first = auth_service.get_supabase()
+            assert auth_service.get_supabase() is first
+            assert len(auth_service._http_clients) == 1
+
+            auth_service.close_supabase()
+            assert auth_service._http_clients == []
+            assert auth_service.get_supabase() is not first
+            assert create.call_count == 2
+    finally:
+        auth_service.close_supabase()
+
+def test_get_queue_stats_uses_status_counts():
+    queue = MagicMock()
+    queue.get_queue_stats.return_value = {"total": 3, "queued": 2, "processing": 1, "completed": 0, "failed": 0}
+    with patch('job_queue.JobQueue.get_instance', return_value=queue):
+        stats = AuthService.get_queue_stats()
+    assert stats["queued"] == 2 and stats["processing"] == 1 and stats["total"] == 3
+    queue.get_all_jobs.assert_not_called()
+
+def test_failed_history_insert_is_retried_once(admin_client):
+    import auth_service
+    insert = admin_client.table.return_value.insert.return_value
+    insert.execute.side_effect = [Exception("timeout"), MagicMock()]
+    with patch('auth_service._ensure_history_writer'), patch('auth_service.time.sleep'):
+        AuthService.add_history("user-1", {"prompt": "a"})
+        auth_service.flush_history()
+    assert insert.execute.call_count == 2
+    assert auth_service._history_queue.unfinished_tasks == 0
+
+def test_mock_user_indexes_follow_direct_writes():
+    import auth_service
+    users = auth_service.MOCK_USERS
+    saved = dict(users)
+    try:
+        users.clear()
+        users["a@example.com"] = {"user_id": "u-1", "api_key": "key-a", "history": []}
+        assert auth_service._mock_user_by_api_key("key-a")[0] == "a@example.com"
+
+        # Replacing a user drops its old index entries
+        users["a@example.com"] = {"user_id": "u-2", "api_key": None, "history": []}
+        assert auth_service._mock_user_by_id("u-1") == (None, None)
+        assert auth_service._mock_user_by_api_key("key-a") == (None, None)
+        assert auth_service._mock_user_by_id("u-2")[0] == "a@example.com"
+
+        # Every other mutator goes through the same indexing
+        users.setdefault("b@example.com", {"user_id": "u-3", "api_key": "key-b", "history": []})
+        users |= {"c@example.com": {"user_id": "u-4", "api_key": "key-c", "history": []}}
+        assert auth_service._mock_user_by_api_key("key-b")[0] == "b@example.com"
+        assert auth_service._mock_user_by_api_key("key-c")[0] == "c@example.com"
+        while users:
+            users.popitem()
+        assert auth_service._mock_user_by_id("u-3") == (None, None)
+        assert auth_service._mock_user_by_api_key("key-c") == (None, None)
+    finally:
+        users.clear()
+        users.update(saved)
+
+def test_history_keyset_cursor_includes_id(admin_client):
+    ts = "2026-01-01T00:00:00+00:00"
+    rows = [{"id": 3, "created_at": ts}, {"id": 2, "created_at": ts}, {"id": 1, "created_at": ts}]
+    query = admin_client.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.limit.return_value.execute.return_value = MagicMock(data=rows)
+
+    page, cursor = AuthService.get_history("user-1", page_size=2)
+    assert [r["id"] for r in page] == [3, 2]
+    assert cursor == f"{ts}|2"
+
+    query.or_.return_value.order.return_value.order.return_value.limit.return_value.execute.return_value = MagicMock(data=rows[2:])
+    page, cursor = AuthService.get_history("user-1", page_size=2, cursor=cursor)
+    assert [r["id"] for r in page] == [1] and cursor is None
+    query.or_.assert_called_once_with(f'created_at.lt."{ts}",and(created_at.eq."{ts}",id.lt.2)')
@@ -0,0 +1,102 @@
+"""
+Tests for the Concurrency Manager
+"""
+import threading
+import pytest
+from unittest.mock import MagicMock
+
+from concurrency_manager import ConcurrencyManager
+
+class TestConcurrencyManager:
+    @pytest.fixture
+    def manager(self):
+        """Provide a fresh manager and restore the shared singleton afterwards."""
+        previous = ConcurrencyManager._instance
+        ConcurrencyManager._instance = None
+        try:
+            yield ConcurrencyManager.get_instance()
+        finally:
+            ConcurrencyManager._instance = previous
+
+    def test_singleton_pattern(self, manager):
+        """Test that repeated lookups return the same instance."""
+        assert ConcurrencyManager.get_instance() is manager
+        assert ConcurrencyManager() is manager
+
+    def test_one_job_per_user(self, manager):
+        """Test that a user cannot hold two slots at once."""
+        assert manager.acquire("user1", "job1") is True
+        assert manager.acquire("user1", "job2") is False
+        assert manager.active_count == 1
+
+    def test_release_requires_matching_job(self, manager):
+        """Test that releasing with a different job id is a no-op."""
+        manager.acquire("user1", "job1")
+        manager.release("user1", "other-job")
+        assert manager.active_count == 1
+        manager.release("user1", "job1")
+        assert manager.active_count == 0
+        assert "user1" not in manager.active_user_jobs
+
+    def test_global_limit_under_contention(self, manager):
+        """Test that concurrent acquires never exceed the global limit."""
+        barrier = threading.Barrier(50)
+        results = []
+
+        def worker(i):
+            barrier.wait()
+            results.append(manager.acquire(f"user{i}", f"job{i}"))
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(50)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sum(results) == manager.global_limit
+        assert manager.active_count == manager.global_limit
+        assert len(manager.active_user_jobs) == manager.global_limit
+
+    def test_snapshot(self, manager):
+        """Test the advisory snapshot reflects acquired slots."""
+        assert manager.snapshot("user1") == (0, False)
+        manager.acquire("user1", "job1")
+        assert manager.snapshot("user1") == (1, True)
+        assert manager.snapshot("user2") == (1, False)
+
+    def test_redis_backend_delegates_to_script(self, manager):
+        """Test that acquire goes through the shared Lua script when Redis is configured."""
+        calls = []
+
+        def script(keys, args):
+            calls.append((keys, args))
+            return 1
+
+        manager._redis = object()
+        manager._acquire_script = script
+        assert manager.acquire("user1", "job1") is True
+        keys, args = calls[0]
+        assert keys == ["{concurrency}:global", "{concurrency}:user:user1"]
+        assert args[2] == "user1:job1"
+        assert args[3:] == [1, manager.global_limit]
+        assert manager.active_count == 0
+
+    def test_redis_errors_fall_back_to_local_slots(self, manager):
+        """Test that a Redis outage degrades to per-process slots instead of raising."""
+        class FakeRedisError(Exception):
+            pass
+
+        def fail(*args, **kwargs):
+            raise FakeRedisError("connection refused")
+
+        manager._redis = MagicMock()
+        manager._redis.pipeline.side_effect = fail
+        manager._redis.zrange.side_effect = fail
+        manager._redis_error = FakeRedisError
+        manager._acquire_script = fail
+
+        assert manager.acquire("user1", "job1") is True
+        assert manager.snapshot("user1") == (1, True)
+        assert manager.get_status()["active_users"] == ["user1"]
+        manager.release("user1", "job1")
+        assert manager.snapshot("user1") == (0, False)
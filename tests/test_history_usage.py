@@ -60,7 +60,20 @@ def test_history_management():
     }
     AuthService.add_history("admin-uuid", entry)
     
-    history = AuthService.get_history("admin-uuid")
+    history, next_cursor = AuthService.get_history("admin-uuid")
     assert len(history) == 1
+    assert next_cursor is None
     assert history[0]["prompt"] == "test prompt"
     assert "timestamp" in history[0]
+
+def test_history_pagination():
+    for i in range(5):
+        AuthService.add_history("admin-uuid", {"id": f"gen-{i}", "prompt": f"prompt {i}"})
+
+    page, cursor = AuthService.get_history("admin-uuid", page_size=2)
+    assert [e["id"] for e in page] == ["gen-4", "gen-3"]
+    page, cursor = AuthService.get_history("admin-uuid", page_size=2, cursor=cursor)
+    assert [e["id"] for e in page] == ["gen-2", "gen-1"]
+    page, cursor = AuthService.get_history("admin-uuid", page_size=2, cursor=cursor)
+    assert [e["id"] for e in page] == ["gen-0"]
+    assert cursor is None
@@ -1,6 +1,7 @@
 """
 Tests for the Job Queue System
 """
+import base64
 import pytest
 import tempfile
 import os
@@ -132,6 +133,82 @@ class TestJobQueue:
         user2_jobs = queue.get_user_jobs("user2", limit=10)
         assert len(user2_jobs) == 1
 
+    def test_listed_jobs_match_to_dict(self, queue):
+        """Test that listed jobs serialize exactly like Job.to_dict()."""
+        # Saved directly so the background worker doesn't pick it up
+        job = Job(
+            job_id="job1",
+            user_id="user1",
+            model="wan2.1",
+            status=JobStatus.COMPLETED,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            prompt="Test",
+            metrics={"generation_time": 1.5}
+        )
+        queue._save_job(job)
+        
+        listed = queue.get_user_jobs("user1", limit=10)
+        assert listed == [queue._load_job("job1").to_dict()]
+
+    def test_get_user_usage(self, queue):
+        """Test counting a user's total, recent and per-status jobs."""
+        created = [datetime(2025, 1, 1), datetime(2025, 1, 2), datetime(2025, 1, 3), datetime(2020, 1, 1)]
+        for i, created_at in enumerate(created):
+            queue._save_job(Job(
+                job_id=f"job{i}",
+                user_id="user1",
+                model="wan2.1",
+                status=JobStatus.FAILED if i == 0 else JobStatus.COMPLETED,
+                created_at=created_at,
+                updated_at=created_at,
+                prompt=f"Test {i}"
+            ))
+        
+        usage = queue.get_user_usage("user1", datetime(2024, 1, 1))
+        assert usage["total"] == 4
+        assert usage["recent"] == 3
+        assert usage["by_status"]["completed"] == 3
+        assert usage["by_status"]["failed"] == 1
+        assert usage["by_status"]["queued"] == 0
+
+        empty = queue.get_user_usage("nobody", datetime(2024, 1, 1))
+        assert (empty["total"], empty["recent"]) == (0, 0)
+
+    def test_job_ids_are_short_and_unique(self, queue):
+        """Test job ids are 26-char lowercase base32."""
+        ids = {queue._new_job_id() for _ in range(100)}
+        assert len(ids) == 100
+        for job_id in ids:
+            assert len(job_id) == 26
+            assert set(job_id) <= set("abcdefghijklmnopqrstuvwxyz234567")
+
+    def test_database_uses_wal(self, queue):
+        """Test the job database is opened in WAL mode."""
+        with queue._connect() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_get_queue_stats(self, queue):
+        """Test per-status counts."""
+        statuses = [JobStatus.QUEUED, JobStatus.COMPLETED, JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED]
+        for i, status in enumerate(statuses):
+            queue._save_job(Job(
+                job_id=f"job{i}",
+                user_id="user1",
+                model="wan2.1",
+                status=status,
+                created_at=datetime.now(),
+                updated_at=datetime.now()
+            ))
+        
+        assert queue.get_queue_stats() == {
+            "total": 5,
+            "queued": 1,
+            "processing": 0,
+            "completed": 2,
+            "failed": 1
+        }
+
     def test_job_to_dict(self):
         """Test Job serialization."""
         job = Job(
@@ -164,7 +241,7 @@ class TestJobQueue:
         
         # Mock storage service
         with patch('job_queue.StorageService') as mock_storage:
-            mock_storage.return_value.upload_file.return_value = "https://example.com/video.mp4"
+            mock_storage.return_value.upload_bytes.return_value = "https://example.com/video.mp4"
             
             # Create job
             job_data = {
@@ -186,6 +263,25 @@ class TestJobQueue:
             assert job.status == JobStatus.COMPLETED
             assert job.result_url is not None
 
+    def test_upload_video_decodes_base64_output(self, queue):
+        """RunPod base64 output is decoded before it reaches GCS."""
+        video = os.urandom(300_000)
+        uploaded = {}
+
+        def upload_stream(file_obj, filename):
+            file_obj.seek(0)
+            uploaded[filename] = file_obj.read()
+            return "https://example.com/video.mp4"
+
+        with patch('job_queue.StorageService') as mock_storage:
+            mock_storage.return_value.upload_stream.side_effect = upload_stream
+            output = [{"video": "data:video/mp4;base64," + base64.b64encode(video).decode()}]
+            url = queue._upload_video_to_gcs("job1", output, "wan2.1")
+
+            assert url == "https://example.com/video.mp4"
+            assert list(uploaded.values()) == [video]
+            assert queue._upload_video_to_gcs("job2", {"status": "done"}, "wan2.1") == ""
+
     @patch('job_queue.VideoClientFactory')
     def test_process_job_failure(self, mock_factory, queue):
         """Test job processing failure."""
@@ -32,6 +32,16 @@ def test_upload_file_success(service, mock_storage_client):
     service.bucket.blob.assert_called_with(destination_blob_name)
     mock_blob.upload_from_filename.assert_called_with(local_path)
     mock_blob.generate_signed_url.assert_called_once()
+def test_upload_bytes_success(service):
+    mock_blob = MagicMock()
+    service.bucket.blob.return_value = mock_blob
+    mock_blob.generate_signed_url.return_value = "https://storage.googleapis.com/test-bucket/jobs/a.mp4?signature=xyz"
+
+    url = service.upload_bytes(b"video", "jobs/a.mp4")
+
+    assert url == "https://storage.googleapis.com/test-bucket/jobs/a.mp4?signature=xyz"
+    mock_blob.upload_from_string.assert_called_once_with(b"video", content_type="video/mp4")
+
 def test_init_missing_bucket_env():
     with patch.dict('os.environ', {}, clear=True):
         with pytest.raises(ValueError, match="GCS_BUCKET_NAME environment variable is required"):
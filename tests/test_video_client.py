@@ -0,0 +1,139 @@
+"""
+Tests for the RunPod Wan video client
+"""
+import base64
+import json
+import os
+from unittest.mock import MagicMock, patch
+
+from generate_video_client import Base64ImageBody, WanVideoClient, POLL_INITIAL_INTERVAL, POLL_RUNNING_INTERVAL
+
+def test_base64_image_body_streams_valid_json(tmp_path):
+    image = os.urandom(100_001)
+    image_path = tmp_path / "cat.png"
+    image_path.write_bytes(image)
+    payload = {"input": {"prompt": 'a "cat"', "width": 1280}}
+
+    body = Base64ImageBody(payload, str(image_path))
+    streamed = b"".join(iter(lambda: body.read(8192), b""))
+
+    assert len(streamed) == len(body)
+    data = json.loads(streamed)
+    assert data["input"]["prompt"] == 'a "cat"'
+    assert base64.b64decode(data["input"]["image_base64"]) == image
+
+    whole = Base64ImageBody(payload, str(image_path))
+    assert whole.read(10) + whole.read() == streamed
+
+def test_save_video_result_decodes_in_chunks(tmp_path):
+    video = os.urandom(700_000)
+    encoded = "data:video/mp4;base64," + base64.b64encode(video).decode()
+    client = WanVideoClient("endpoint", "key")
+    output_path = tmp_path / "out.mp4"
+
+    assert client.save_video_result({"status": "COMPLETED", "output": {"video": encoded}}, str(output_path))
+    assert output_path.read_bytes() == video
+
+    assert not client.save_video_result({"status": "COMPLETED", "output": "not base64!"}, str(output_path))
+    assert not output_path.exists()
+
+def test_decode_base64_to_handles_line_wrapped_input():
+    import io
+    from generate_video_client import decode_base64_to
+    video = os.urandom(700_001)
+    for encoded in (base64.encodebytes(video).decode(), base64.encodebytes(video)):
+        out = io.BytesIO()
+        decode_base64_to(encoded, out)
+        assert out.getvalue() == video
+
+def _status(code, status=None, **extra):
+    response = MagicMock(status_code=code)
+    response.json.return_value = {"status": status, **extra}
+    return response
+
+def test_poll_job_backs_off_on_errors_and_resets_when_running():
+    client = WanVideoClient("endpoint", "key")
+    responses = [
+        _status(503), _status(503),
+        _status(200, "IN_QUEUE"),
+        _status(200, "IN_PROGRESS"),
+        _status(200, "COMPLETED", output={"video": "abc"}),
+    ]
+    sleeps = []
+    with patch.object(client.session, 'get', side_effect=responses), \
+         patch('generate_video_client.time.sleep', side_effect=sleeps.append), \
+         patch('generate_video_client.random.uniform', return_value=0):
+        result = client._poll_job("job-1", submission_time=0)
+
+    assert result["status"] == "COMPLETED"
+    assert sleeps == [1.0, 2.0, POLL_INITIAL_INTERVAL, POLL_RUNNING_INTERVAL]
+
+def test_poll_job_backs_off_only_while_queued():
+    client = WanVideoClient("endpoint", "key")
+    responses = [_status(200, "IN_QUEUE"), _status(200, "IN_QUEUE")]
+    responses += [_status(200, "IN_PROGRESS")] * 3 + [_status(200, "COMPLETED", output={"video": "abc"})]
+    sleeps = []
+    with patch.object(client.session, 'get', side_effect=responses), \
+         patch('generate_video_client.POLL_FAST_WINDOW', 0), \
+         patch('generate_video_client.time.sleep', side_effect=sleeps.append), \
+         patch('generate_video_client.random.uniform', return_value=0):
+        client._poll_job("job-1", submission_time=0)
+
+    assert sleeps[:2] == [POLL_INITIAL_INTERVAL * 1.5, POLL_INITIAL_INTERVAL * 1.5 ** 2]
+    assert sleeps[2:] == [POLL_RUNNING_INTERVAL] * 3
+
+def test_clients_share_one_runpod_session():
+    assert WanVideoClient("a", "key").session is WanVideoClient("b", "key").session
+
+def test_batch_process_images_runs_concurrently_in_file_order(tmp_path):
+    import threading
+    for name in ("a.png", "b.png", "c.png", "notes.txt"):
+        (tmp_path / name).write_bytes(b"x")
+    client = WanVideoClient("endpoint", "key")
+    barrier = threading.Barrier(3, timeout=5)
+
+    def create(image_path, **kwargs):
+        barrier.wait()  # only passes if all three images are in flight together
+        return {"status": "COMPLETED" if not image_path.endswith("b.png") else "FAILED", "error": "boom"}
+
+    with patch.object(client, 'create_video_from_image', side_effect=create), \
+         patch.object(client, 'save_video_result', return_value=True):
+        summary = client.batch_process_images(str(tmp_path), str(tmp_path / "out"), "a prompt", max_workers=3)
+
+    assert summary["total_files"] == 3
+    assert summary["successful"] == 2
+    listed = [f for f in os.listdir(tmp_path) if f.endswith(".png")]
+    assert [r["file"] for r in summary["results"]] == listed
+    assert {r["file"]: r["status"] for r in summary["results"]} == {"a.png": "SUCCESS", "b.png": "FAILED", "c.png": "SUCCESS"}
+
+def test_create_video_sends_image_url_when_enabled(tmp_path):
+    image_path = tmp_path / "cat.png"
+    image_path.write_bytes(b"png")
+    storage = MagicMock()
+    storage.upload_file.return_value = "https://storage.googleapis.com/bucket/inputs/cat.png?sig"
+    client = WanVideoClient("endpoint", "key", use_url_upload=True, storage_service=storage)
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"id": "job", "status": "COMPLETED"}
+
+    with patch.object(client.session, "post", return_value=response) as post:
+        client.create_video_from_image(str(image_path), "a cat")
+
+    destination = storage.upload_file.call_args.args[1]
+    assert destination.startswith("inputs/") and destination.endswith(".png")
+    data = json.loads(post.call_args.kwargs["data"])
+    assert data["input"]["image_url"] == storage.upload_file.return_value
+    assert "image_base64" not in data["input"]
+
+def test_list_images_cached_reuses_listing_until_folder_changes(tmp_path):
+    from generate_video_client import _list_images_cached
+    (tmp_path / "a.PNG").write_bytes(b"")
+    (tmp_path / "notes.txt").write_bytes(b"")
+    (tmp_path / "dir.jpg").mkdir()
+
+    first = _list_images_cached(str(tmp_path))
+    assert first == ("a.PNG",)
+    assert _list_images_cached(str(tmp_path)) is first
+
+    (tmp_path / "b.jpg").write_bytes(b"")
+    os.utime(tmp_path, ns=(0, os.stat(tmp_path).st_mtime_ns + 1))
+    assert sorted(_list_images_cached(str(tmp_path))) == ["a.PNG", "b.jpg"]
@@ -7,6 +7,9 @@ from logging.handlers import RotatingFileHandler
 from functools import wraps
 from PIL import Image
 from flask import Flask, render_template, request, send_from_directory, url_for, jsonify, session, redirect
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.middleware.proxy_fix import ProxyFix
+import orjson
 from flask_bcrypt import Bcrypt
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -18,8 +21,7 @@ load_dotenv(".env.client") # Load public client variables
 load_dotenv(".env")        # Load secrets (overrides if present)
 
 # 2. Configure Logging
-if not os.path.exists('logs'):
-    os.makedirs('logs')
+os.makedirs('logs', exist_ok=True)
 
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger("vividflow")
@@ -45,14 +47,38 @@ from video_client_factory import VideoClientFactory
 from prompt_enhancer import PromptEnhancer
 from veo_prompt_enhancer import VeoPromptEnhancer
 from storage_service import StorageService
-from auth_service import AuthService
+from auth_service import AuthService, get_supabase, get_supabase_admin, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE
 
 # NEW IMPORTS FOR QUEUE SYSTEM
 from job_queue import JobQueue
-from api_router import api_bp, get_api_rate_limiter
+from api_router import api_bp, get_api_rate_limiter, RATELIMIT_STORAGE_URI
 from concurrency_manager import ConcurrencyManager
 
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify() via orjson; output matches the default provider (sorted keys,
+    HTTP dates) since datetimes are passed through to its default()."""
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.option)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Reverse proxies in front of the app (e.g. 1 on Cloud Run). X-Forwarded-For
+# is resolved once here, so request.remote_addr - and with it the limiters'
+# get_remote_address key - is the real client rather than the proxy.
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
 app.config['UPLOAD_FOLDER'] = 'temp_uploads'
 app.config['OUTPUT_FOLDER'] = 'output'
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "supersecretkey")
@@ -66,7 +92,8 @@ if os.getenv("FLASK_ENV") == "production":
         get_remote_address,
         app=app,
         default_limits=["2000 per day", "500 per hour"],
-        storage_uri="memory://",
+        storage_uri=RATELIMIT_STORAGE_URI,
+        in_memory_fallback_enabled=True,
     )
 else:
     # Development: no-op limiter by setting extremely high limits
@@ -74,7 +101,8 @@ else:
         get_remote_address,
         app=app,
         default_limits=["1000000 per day"],
-        storage_uri="memory://",
+        storage_uri=RATELIMIT_STORAGE_URI,
+        in_memory_fallback_enabled=True,
     )
     logger.info("Rate limiter set to high limits for development.")
 
@@ -86,6 +114,10 @@ api_limiter.init_app(app)
 
 CORS(app)
 
+# Warm the Supabase clients so the first request doesn't pay init cost
+get_supabase()
+get_supabase_admin()
+
 # Ensure directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
@@ -114,6 +146,13 @@ def ratelimit_handler(e):
         return jsonify(error="Rate limit exceeded", details=str(e)), 429
     return render_template('index.html', error="Too many requests. Please try again later."), 429
 
+@app.errorhandler(413)
+def request_too_large_handler(e):
+    logger.warning(f"Request too large: {request.content_length} bytes to {request.path}")
+    if request.path.startswith('/api/') or request.headers.get('Accept') == 'application/json':
+        return jsonify(error="Request too large"), 413
+    return render_template('index.html', error="Uploaded file is too large."), 413
+
 @app.errorhandler(Exception)
 def handle_unexpected_error(e):
     logger.error(f"Unhandled Exception: {e}", exc_info=True)
@@ -434,10 +473,19 @@ def generate():
 @app.route('/api/history', methods=['GET'])
 @login_required
 def get_history_api():
-    """Legacy API endpoint for history - uses Supabase"""
+    """Legacy API endpoint for history - uses Supabase.
+    Pages with ?limit= and ?cursor=; the next cursor comes back in X-Next-Cursor."""
     user_id = session.get('user_id')
-    history = AuthService.get_history(user_id)
-    return jsonify(history)
+    limit = request.args.get('limit', HISTORY_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), HISTORY_MAX_PAGE_SIZE)
+    try:
+        history, next_cursor = AuthService.get_history(user_id, limit, request.args.get('cursor'))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    response = jsonify(history)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @app.route('/output/<filename>')
 def get_video(filename):
@@ -473,9 +521,10 @@ def admin_approve_web():
     if not is_admin:
         return 'Access Denied', 403
     
-    user_id = request.form.get('user_id')
-    if user_id:
-        AuthService.approve_user(user_id)
+    # One user_id per row button; "Approve all" posts every pending id
+    user_ids = request.form.getlist('user_id')
+    if user_ids:
+        AuthService.approve_users(user_ids)
     
     return redirect(url_for('admin_dashboard'))
 